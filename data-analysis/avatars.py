@@ -0,0 +1,232 @@
+import io
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import requests
+
+import instrument
+from uuid_cache import dashed_uuid, plain_uuid, retry_delay
+
+try:
+    from PIL import Image
+except ImportError:  # only needed to pack the sheets, pip install pillow
+    Image = None
+
+
+# the 32px faces the scoreboard shows next to every name
+face_url = "https://crafatar.com/avatars/{}?size=32&overlay"
+face_size = 32
+
+# the page's placeholder for players without a UUID
+default_uuid = "8667ba71-b85a-4004-af54-457a9734eed7"
+
+index_version = 1
+
+
+class FaceCache:
+    """Content-addressed local cache of player faces
+
+    Every downloaded image is stored once as objects/<sha1>.png and the
+    index maps each UUID to its image hash, so players sharing a skin share
+    a file. Faces are re-checked after ttl seconds with the stored ETag; an
+    unchanged face costs a 304 and no download.
+    """
+
+    def __init__(self, directory: str = 'avatar_cache', ttl: float = 7 * 24 * 60 * 60, max_workers: int = 8,
+                 retries: int = 3, backoff: float = 1.0, timeout: float = 10, url: str = face_url):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.url = url
+        self.session = requests.Session()
+
+        self.index_path = os.path.join(directory, 'index.json')
+        self.faces = {}
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == index_version:
+                self.faces = data.get('faces', {})
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', f"{digest}.png")
+
+    def face(self, uuid: str) -> Optional[str]:
+        """Image hash of a UUID's cached face, None if it has none"""
+        entry = self.faces.get(plain_uuid(uuid))
+        if entry is None or entry["hash"] is None or not os.path.exists(self.object_path(entry["hash"])):
+            return None
+        return entry["hash"]
+
+    def _request(self, url: str, headers: dict) -> Optional[requests.Response]:
+        """GET with backoff on 429 and server errors, honouring Retry-After, as UUIDCache does"""
+        for attempt in range(self.retries + 1):
+            instrument.count("face_requests")
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Error requesting {url}: {e}")
+                response = None
+
+            if response is not None and response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt < self.retries:
+                time.sleep(retry_delay(response, self.backoff * 2 ** attempt))
+        return None
+
+    def _fetch(self, uuid: str, now: float) -> Optional[dict]:
+        entry = self.faces.get(uuid)
+        headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") and self.face(uuid) else {}
+
+        response = self._request(self.url.format(dashed_uuid(uuid)), headers)
+        if response is None:
+            return None
+        if response.status_code == 304:
+            return dict(entry, checked=now)
+        if response.status_code != 200:
+            # remembered until the next check, like unknown names in UUIDCache
+            print(f"No face for {uuid}: HTTP {response.status_code}")
+            return {"hash": None, "checked": now}
+
+        digest = hashlib.sha1(response.content).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            with open(path + '.tmp', 'wb') as f:
+                f.write(response.content)
+            os.replace(path + '.tmp', path)
+        instrument.count("face_bytes_downloaded", len(response.content))
+        return {"hash": digest, "etag": response.headers.get("ETag"), "checked": now, "downloaded": now}
+
+    @instrument.traced("faces")
+    def update(self, uuids: Iterable[str], now: Optional[float] = None) -> int:
+        """Fetch the faces of UUIDs not checked within ttl, returning how many were checked"""
+        now = time.time() if now is None else now
+        due = [uuid for uuid in dict.fromkeys(plain_uuid(uuid) for uuid in uuids)
+               if uuid not in self.faces or now - self.faces[uuid]["checked"] >= self.ttl
+               or (self.faces[uuid]["hash"] is not None and self.face(uuid) is None)]
+        if not due:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda uuid: self._fetch(uuid, now), due))
+
+        for uuid, entry in zip(due, results):
+            if entry is not None:
+                self.faces[uuid] = entry
+        downloaded = sum(entry is not None and entry.get("downloaded") == now for entry in results)
+        missing = sum(entry is None or entry["hash"] is None for entry in results)
+        print(f"Checked {len(due)} faces, {downloaded} downloaded, {missing} without a face")
+        return len(due)
+
+    def save(self):
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({"version": index_version, "faces": self.faces}, f, indent=1, sort_keys=True)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def prune(self) -> int:
+        """Delete images no UUID refers to anymore"""
+        used = {entry["hash"] for entry in self.faces.values() if entry["hash"]}
+        removed = 0
+        for filename in os.listdir(os.path.join(self.directory, 'objects')):
+            if filename.endswith('.png') and filename[:-4] not in used:
+                os.remove(os.path.join(self.directory, 'objects', filename))
+                removed += 1
+        return removed
+
+
+def load_player_uuids(path: str = 'player_uuids.json') -> Dict[str, str]:
+    """The name -> UUID list helpers.assemblePlayerList keeps up to date"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@instrument.traced("atlas")
+def build_atlas(uuids: Iterable[str], cache: FaceCache, directory: str = 'avatars', size: int = face_size,
+                columns: int = 32, max_faces: int = 1024) -> Dict[str, object]:
+    """Pack the cached faces into sprite sheets plus atlas.json, the UUID -> [sheet, x, y] map
+
+    Each distinct image gets one cell and sheets hold up to max_faces cells,
+    so 250 players make a single sheet. Sheet names carry their content hash
+    and can be cached forever; UUIDs without a face point at the default
+    face if that is cached, and are left out otherwise.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is needed to build the avatar atlas: pip install pillow")
+
+    uuids = list(dict.fromkeys(plain_uuid(uuid) for uuid in uuids))
+    fallback = cache.face(default_uuid)
+    hashes = {uuid: cache.face(uuid) or fallback for uuid in uuids}
+    cells = sorted((set(hashes.values()) | {fallback}) - {None})
+
+    os.makedirs(directory, exist_ok=True)
+    sheets = []
+    positions = {}
+    for start in range(0, len(cells), max_faces):
+        chunk = cells[start:start + max_faces]
+        rows = -(-len(chunk) // columns)
+        sheet = Image.new('RGBA', (min(len(chunk), columns) * size, rows * size))
+
+        for i, digest in enumerate(chunk):
+            with Image.open(cache.object_path(digest)) as face:
+                face = face.convert('RGBA')
+                if face.size != (size, size):
+                    face = face.resize((size, size), Image.NEAREST)
+                x, y = i % columns * size, i // columns * size
+                sheet.paste(face, (x, y))
+                positions[digest] = [len(sheets), x, y]
+
+        payload = io.BytesIO()
+        sheet.save(payload, format='PNG', optimize=True)
+        filename = f"faces-{hashlib.sha1(payload.getvalue()).hexdigest()[:12]}.png"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(payload.getvalue())
+        sheets.append(filename)
+
+    atlas = {
+        "size": size,
+        "sheets": sheets,
+        "default": positions.get(fallback),
+        "faces": {dashed_uuid(uuid): positions[digest] for uuid, digest in hashes.items() if digest is not None},
+    }
+    with open(os.path.join(directory, 'atlas.json'), 'w', encoding='utf-8') as f:
+        json.dump(atlas, f, separators=(',', ':'))
+
+    for filename in os.listdir(directory):
+        if filename.startswith('faces-') and filename.endswith('.png') and filename not in sheets:
+            os.remove(os.path.join(directory, filename))
+
+    print(f"Packed {len(cells)} distinct faces of {len(uuids)} players into {len(sheets)} sheet(s) in {directory}/")
+    return atlas
+
+
+def update_avatars(uuids_file: str = 'player_uuids.json', cache_dir: str = 'avatar_cache', directory: str = 'avatars',
+                   url: str = face_url, ttl: float = 7 * 24 * 60 * 60) -> Dict[str, object]:
+    """Refresh the face cache for every player in uuids_file and rebuild the atlas"""
+    uuids = list(load_player_uuids(uuids_file).values())
+    cache = FaceCache(cache_dir, ttl=ttl, url=url)
+    cache.update(uuids + [default_uuid])
+    cache.save()
+    cache.prune()
+    return build_atlas(uuids, cache, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download player faces and pack them into a sprite atlas")
+    parser.add_argument('--uuids', default='player_uuids.json')
+    parser.add_argument('--cache', default='avatar_cache')
+    parser.add_argument('--output', default='avatars')
+    parser.add_argument('--url', default=face_url, help="face URL template, {} is the dashed UUID")
+    parser.add_argument('--ttl', type=float, default=7, help="days before a face is checked again")
+    args = parser.parse_args()
+
+    update_avatars(args.uuids, args.cache, args.output, url=args.url, ttl=args.ttl * 24 * 60 * 60)
+    instrument.finish()
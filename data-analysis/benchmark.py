@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import export
+import ingest
+import normalize
+import ranking
+import synthetic
+import update_player_data
+
+benchmark_version = 1
+
+
+class Benchmark:
+    """Times (and optionally memory-profiles) named pipeline stages
+
+    tracemalloc slows the stages down several times over, so timings of
+    memory-profiled runs are only comparable with each other.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str, items: Optional[int] = None):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            result = {"seconds": round(seconds, 4)}
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                result["peak_mb"] = round(peak / 2 ** 20, 2)
+            if items is not None:
+                result["items"] = items
+            self.stages[name] = result
+            print(f"  {name}: {seconds:.3f}s" + (f", peak {result['peak_mb']} MB" if self.memory else ""))
+
+
+def fake_api_response(rng: random.Random) -> Dict[str, Any]:
+    games = rng.randint(10, 5000)
+    minigames = games * rng.randint(5, 9)
+    return {
+        "playerInfo": {"rank": {"name": rng.choice(update_player_data.keywords)}},
+        "stats": {"mp": {
+            "global": {
+                "wins": rng.randint(0, games), "games": games,
+                "minigame_wins": rng.randint(0, minigames), "minigames": minigames,
+                "time": rng.randint(0, 10 ** 9), "points": rng.randint(0, 10 ** 5), "rank_points": rng.randint(0, 10 ** 4),
+            },
+            "monthly": {"time": rng.randint(0, 10 ** 4)},
+        }},
+    }
+
+
+def run(players: int = 10000, seed: int = 0, memory: bool = False, workdir: Optional[str] = None,
+        template_dir: str = 'in-new') -> Dict[str, Any]:
+    """Run every stage on players synthetic captures and return the results"""
+    workdir = workdir or tempfile.mkdtemp(prefix='mcp-bench-')
+    capture_dir = os.path.join(workdir, 'in')
+    bench = Benchmark(memory=memory)
+    print(f"Benchmarking {players} synthetic players in {workdir}")
+
+    with bench.stage("generate", items=players):
+        names = synthetic.generate_players(capture_dir, players, seed=seed, template_dir=template_dir)
+
+    with bench.stage("ingest", items=players):
+        table = ingest.load_records(capture_dir)
+
+    cache = ingest.ParseCache(os.path.join(workdir, 'parse_cache.json'))
+    ingest.load_records(capture_dir, cache=cache)
+    with bench.stage("ingest_cached", items=players):
+        ingest.load_records(capture_dir, cache=ingest.ParseCache(cache.path))
+
+    with bench.stage("normalize", items=len(ingest.minigames)):
+        frames = export.minigame_frames(table)
+
+    with bench.stage("rank", items=len(table.records)):
+        scores = ranking.minigame_scores(normalize.frames_to_records(frames))
+        ranking.write_scores(scores, os.path.join(workdir, 'TotalRankingScores.json'),
+                             os.path.join(workdir, 'MinigameRankingScores.json'))
+
+    with bench.stage("export_json"):
+        export.export_records_json(frames, os.path.join(workdir, 'records_data.json'))
+
+    with bench.stage("export_compact"):
+        export.export_compact(frames, os.path.join(workdir, 'records_data.min.json'))
+
+    with bench.stage("export_shards"):
+        export.export_shards(frames, os.path.join(workdir, 'records'))
+
+    rng = random.Random(seed)
+    old_data = {name: update_player_data.build_player_entry(name, fake_api_response(rng)) for name in names}
+    fetched = {name: update_player_data.build_player_entry(name, fake_api_response(rng)) for name in names[::2]}
+    with bench.stage("player_data_merge", items=players):
+        merged = update_player_data.merge_player_data(names, old_data, fetched)
+        with open(os.path.join(workdir, 'player_data.json'), 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=4)
+
+    return {
+        "version": benchmark_version,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "players": players,
+        "seed": seed,
+        "records": len(table.records),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "memory_profiled": memory,
+        "stages": bench.stages,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.2) -> bool:
+    """Print per-stage time ratios against a baseline run, returning False on a regression"""
+    if results["memory_profiled"] != baseline["memory_profiled"]:
+        print("Warning: only one of the runs was memory-profiled, timings are not comparable")
+
+    ok = True
+    for name, stage in results["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None or not old["seconds"]:
+            continue
+        ratio = stage["seconds"] / old["seconds"]
+        flag = " REGRESSION" if ratio > threshold else ""
+        ok = ok and not flag
+        print(f"  {name}: {old['seconds']:.3f}s -> {stage['seconds']:.3f}s ({ratio:.2f}x){flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the records pipeline on synthetic players")
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier results to compare against")
+    parser.add_argument('--memory', action='store_true', help="record peak memory per stage with tracemalloc")
+    parser.add_argument('--keep', action='store_true', help="keep the generated files")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='mcp-bench-')
+    try:
+        results = run(args.players, seed=args.seed, memory=args.memory, workdir=workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(results, baseline):
+            sys.exit(1)
@@ -0,0 +1,283 @@
+import os
+import gzip
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import instrument
+import normalize
+import ranking
+
+try:
+    import brotli
+except ImportError:  # optional, only needed for the .br sibling
+    brotli = None
+
+
+compact_version = 1
+
+
+@instrument.traced("normalize")
+def minigame_frames(table: ingest.RecordTable) -> Dict[str, pd.DataFrame]:
+    """Normalized player x map frames of every active minigame, in export order"""
+    return {
+        minigame: normalize.normalize_frame(table.frame(minigame), minigame)
+        for minigame in sorted(ingest.minigames)
+        if minigame not in ingest.inactive_minigames
+    }
+
+
+def records_list(frames: Dict[str, pd.DataFrame]) -> List[Dict[str, Any]]:
+    """One record dict per (player, minigame), as the scoreboard loads them"""
+    all_records = []
+    for minigame, records in frames.items():
+        for player_name, row in records.iterrows():
+            record = {
+                "name": player_name,
+                "minigame": minigame,
+                "scores": {}
+            }
+
+            for map_name in records.columns:
+                score = row[map_name]
+                if pd.notna(score):  # Only include non NaN scores
+                    record["scores"][map_name] = score.item()
+
+            if record["scores"]:
+                record["best_score"] = max(record["scores"].values())
+
+            all_records.append(record)
+
+    return all_records
+
+
+@instrument.traced()
+def export_records_json(frames: Dict[str, pd.DataFrame], records_file: str = 'records_data.json'):
+    """Write the records in the original indented format"""
+    with open(records_file, 'w') as f:
+        json.dump(records_list(frames), f, indent=2)
+
+    print(f"Records exported successfully to {records_file}")
+
+
+def compact_records(frames: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """Columnar form of the records
+
+    Players and maps are dictionary-encoded into shared tables. Each minigame
+    stores the player and map indices it uses plus a row-major value array
+    (one row per player) where null marks a missing record. Players without
+    any record in a minigame are left out.
+    """
+    players = {}
+    maps = {}
+    minigames = {}
+
+    for minigame, records in frames.items():
+        records = records.dropna(how='all')
+        # object dtype keeps integer point columns as ints in the output
+        values = records.astype(object).where(records.notna(), None)
+
+        minigames[minigame] = {
+            "players": [players.setdefault(player, len(players)) for player in records.index],
+            "maps": [maps.setdefault(map_name, len(maps)) for map_name in records.columns],
+            "values": [_plain(value) for row in values.itertuples(index=False) for value in row],
+        }
+
+    return {
+        "version": compact_version,
+        "players": list(players),
+        "maps": list(maps),
+        "minigames": minigames,
+    }
+
+
+@instrument.traced()
+def export_compact(frames: Dict[str, pd.DataFrame], path: str = 'records_data.min.json', compress: bool = True):
+    """Write the compact export without whitespace, plus .gz and .br siblings"""
+    payload = json.dumps(compact_records(frames), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+    written = [path]
+    if compress:
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(payload, compresslevel=9, mtime=0))
+        written.append(path + '.gz')
+
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(payload, quality=11))
+            written.append(path + '.br')
+
+    print(f"Compact records exported to {', '.join(written)}")
+
+
+def load_compact(path: str = 'records_data.min.json') -> List[Dict[str, Any]]:
+    """Expand a compact export back into the record dicts of records_data.json"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.br'):
+        data = brotli.decompress(data)
+    return expand_compact(json.loads(data))
+
+
+def expand_compact(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Record dicts of an already parsed compact export, as expandCompactRecords does in index.html"""
+    players = data["players"]
+    maps = data["maps"]
+
+    all_records = []
+    for minigame, block in data["minigames"].items():
+        map_names = [maps[index] for index in block["maps"]]
+        width = len(map_names)
+
+        for row, player_index in enumerate(block["players"]):
+            values = block["values"][row * width:(row + 1) * width]
+            scores = {map_name: value for map_name, value in zip(map_names, values) if value is not None}
+
+            record = {"name": players[player_index], "minigame": minigame, "scores": scores}
+            if scores:
+                record["best_score"] = max(scores.values())
+            all_records.append(record)
+
+    return all_records
+
+
+def verify_compact(compact_path: str = 'records_data.min.json', records_file: str = 'records_data.json') -> bool:
+    """Check that a compact export expands to the same records as records_data.json
+
+    The compact form drops the empty 'scores: {}' placeholders, so those are
+    ignored on the records_data.json side.
+    """
+    with open(records_file, 'r') as f:
+        expected = [record for record in json.load(f) if record["scores"]]
+
+    loaded = load_compact(compact_path)
+    if loaded == expected:
+        return True
+
+    print(f"{compact_path} does not match {records_file}: {len(loaded)} vs {len(expected)} records")
+    return False
+
+
+def shard_name(minigame: str) -> str:
+    """File name of a minigame shard, e.g. 'Einer im Köcher' -> 'einer-im-koecher.json'"""
+    slug = minigame.lower()
+    for umlaut, replacement in (('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('ß', 'ss'), (' ', '-')):
+        slug = slug.replace(umlaut, replacement)
+    return f"{slug}.json"
+
+
+@instrument.traced()
+def export_shards(frames: Dict[str, pd.DataFrame], directory: str = 'records'):
+    """Write one pre-ranked shard per minigame, per-player rank summaries and a manifest
+
+    Every record carries its competition rank ('ranks', ties share the best
+    rank) and dense rank ('dense_ranks') per map, and the rows of a shard are
+    already sorted by the first map in the minigame's sort direction, so the
+    page only has to fetch and display the minigame being viewed.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    manifest = {"version": compact_version, "players": "players.json", "minigames": {}}
+    players = {}
+
+    for minigame, frame in frames.items():
+        direction = "desc" if minigame in ranking.higher_is_better else "asc"
+        if not len(frame):
+            continue
+        frame = frame.dropna(how='all')
+        block, summaries = _shard_records(frame, direction)
+        maps = sorted(frame.columns[frame.notna().any()])
+
+        for name, summary in summaries.items():
+            players.setdefault(name, {})[minigame] = summary
+
+        filename = shard_name(minigame)
+        _write_json(os.path.join(directory, filename), {"minigame": minigame, "direction": direction, "maps": maps, "records": block})
+
+        manifest["minigames"][minigame] = {
+            "file": filename,
+            "direction": direction,
+            "maps": maps,
+            "players": len(block),
+        }
+
+    _write_json(os.path.join(directory, "players.json"), {player: players[player] for player in sorted(players)})
+    _write_json(os.path.join(directory, "manifest.json"), manifest)
+
+    # shards of minigames that are gone or renamed since the last export
+    listed = {entry["file"] for entry in manifest["minigames"].values()} | {"players.json", "manifest.json"}
+    stale = [filename for filename in os.listdir(directory) if filename.endswith('.json') and filename not in listed]
+    for filename in stale:
+        os.remove(os.path.join(directory, filename))
+
+    print(f"Exported {len(manifest['minigames'])} minigame shards to {directory}/"
+          + (f", removed {len(stale)} stale shards" if stale else ""))
+
+
+def _shard_records(frame: pd.DataFrame, direction: str):
+    """Sorted shard records and per-player rank summaries of one minigame frame
+
+    Ranks come from one column-wise rank of the whole frame (the same ranks
+    as ranking.map_ranks), the order from one lexsort, and each record is
+    assembled from row slices of the flattened present cells.
+    """
+    ascending = direction == "asc"
+    ranks = frame.rank(method='min', ascending=ascending).to_numpy()
+    dense_ranks = frame.rank(method='dense', ascending=ascending).to_numpy()
+    # one dtype for the whole frame, as iterrows in records_list gives it
+    values = frame.to_numpy()
+    names = frame.index.to_numpy(dtype=str)
+
+    # the page's default order: first map, missing scores last, ties by name
+    maps = sorted(frame.columns[frame.notna().any()])
+    if maps:
+        first = frame[maps[0]].to_numpy(dtype=float)
+        order = np.lexsort((names, -first if direction == "desc" else first))
+    else:
+        order = np.lexsort((names,))
+
+    rows, columns = np.nonzero(frame.notna().to_numpy()[order])
+    offsets = np.searchsorted(rows, np.arange(len(order) + 1))
+    source = order[rows]
+
+    cell_maps = frame.columns.to_numpy(dtype=object)[columns].tolist()
+    cell_values = values[source, columns].tolist()
+    cell_ranks = ranks[source, columns].astype(int).tolist()
+    cell_dense = dense_ranks[source, columns].astype(int).tolist()
+
+    block = []
+    summaries = {}
+    for i, name in enumerate(names[order].tolist()):
+        cells = slice(offsets[i], offsets[i + 1])
+        scores = dict(zip(cell_maps[cells], cell_values[cells]))
+        record_ranks = dict(zip(cell_maps[cells], cell_ranks[cells]))
+        record_dense = dict(zip(cell_maps[cells], cell_dense[cells]))
+
+        block.append({
+            "name": name,
+            "scores": scores,
+            "best_score": max(scores.values()),
+            "ranks": record_ranks,
+            "dense_ranks": record_dense,
+        })
+        summaries[name] = {"ranks": record_ranks, "dense_ranks": record_dense, "best_rank": min(record_ranks.values())}
+
+    return block, summaries
+
+
+def _write_json(path: str, data: Any):
+    # dumps runs the C encoder, dump would stream through the pure Python one
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+def _plain(value):
+    # numpy scalars are not JSON serializable
+    return value.item() if hasattr(value, 'item') else value
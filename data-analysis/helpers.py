@@ -1,11 +1,13 @@
 import requests
 import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import shutil
 from pathlib import Path
 
+import instrument
+from uuid_cache import UUIDCache
+
 
 def get_username_from_uuid(uuid):
     """Get current username for a given UUID"""
@@ -22,8 +24,14 @@ def get_username_from_uuid(uuid):
         print(f"Error for UUID {uuid}: {e}")
         return None
 
-def update_player_names(input_file, output_file, max_workers=10, delay=0.1):
-    """Update player names from UUIDs and save to new file"""
+@instrument.traced()
+def update_player_names(input_file, output_file, max_workers=10, delay=0.1, cache=None):
+    """Update player names from UUIDs and save to new file
+
+    Names are resolved through the UUIDCache, so only UUIDs that are new or
+    whose cached name expired are requested from Mojang. delay is no longer
+    used and only kept for existing callers.
+    """
     
     # Load existing data
     with open(input_file, 'r') as f:
@@ -36,23 +44,12 @@ def update_player_names(input_file, output_file, max_workers=10, delay=0.1):
     print(f"Found {len(unique_uuids)} unique UUIDs")
     
     # Fetch current usernames
-    uuid_to_name = {}
+    cache = cache or UUIDCache(max_workers=max_workers)
+    uuid_to_name = {uuid: name for uuid, name in cache.names_for(unique_uuids).items() if name}
+    cache.save()
     
-    def fetch_with_delay(uuid):
-        time.sleep(delay)
-        name = get_username_from_uuid(uuid)
-        return uuid, name
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_uuid = {executor.submit(fetch_with_delay, uuid): uuid for uuid in unique_uuids}
-        
-        for i, future in enumerate(as_completed(future_to_uuid)):
-            uuid, current_name = future.result()
-            if current_name:
-                uuid_to_name[uuid] = current_name
-                print(f"Progress: {i+1}/{len(unique_uuids)} - {current_name}")
-            else:
-                print(f"Progress: {i+1}/{len(unique_uuids)} - Failed to get name for {uuid}")
+    failed = len(unique_uuids) - len(uuid_to_name)
+    print(f"Resolved {len(uuid_to_name)}/{len(unique_uuids)} names with {cache.requests} requests, {failed} failed")
     
     # Create updated data structure
     updated_data = {}
@@ -97,13 +94,19 @@ def create_name_list(data, output_file):
     print(f"Player name list saved to: {output_file}")
     return names
 
-def assemblePlayerList():
+def assemblePlayerList(store=None):
     # Update the player data
     updated_data, changes = update_player_names(
         'player_uuids.json', # source file
         'player_uuids.json' # target file
     )
     
+    # Keep the player store in sync with the renamed players
+    if store is not None:
+        for old_name, new_name, uuid in changes:
+            store.rename_player(old_name, new_name)
+        store.add_players(updated_data)
+    
     # Create a simple name list
     names = create_name_list(updated_data, 'player_names.txt')
     
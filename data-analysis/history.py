@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import export
+import ingest
+import normalize
+import ranking
+
+
+schema = """
+CREATE TABLE IF NOT EXISTS changes (
+    player TEXT NOT NULL,
+    minigame TEXT NOT NULL,
+    map TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    value REAL,
+    previous REAL,
+    PRIMARY KEY (player, minigame, map, recorded)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS changes_map ON changes (minigame, map, recorded);
+CREATE INDEX IF NOT EXISTS changes_recorded ON changes (recorded);
+
+CREATE TABLE IF NOT EXISTS current (
+    player TEXT NOT NULL,
+    minigame TEXT NOT NULL,
+    map TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    value REAL,
+    PRIMARY KEY (player, minigame, map)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS current_recorded ON current (recorded);
+"""
+
+# out/snapshots/Elytrarennen--2024-05-01--.json, the manual copies of analysis-v2
+snapshot_name = re.compile(r'(?P<minigame>.+?)--(?P<date>\d{4}-\d{2}-\d{2})--\.json$')
+
+
+def is_better(minigame: str, value: float, other: Optional[float]) -> bool:
+    """Whether value beats other in the minigame's direction, anything beats no value"""
+    if other is None:
+        return True
+    return value > other if minigame in ranking.higher_is_better else value < other
+
+
+def parse_time(value: Any) -> float:
+    """Unix time of a timestamp, datetime or ISO date string"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class RecordHistory:
+    """Append-only history of every (player, minigame, map) record value
+
+    Only changes are stored: a snapshot adds one row to changes per value
+    that differs from the player's current one (value NULL when a record
+    disappeared), together with the value it replaced. The store therefore
+    grows with the number of changes instead of snapshots x players, and any
+    past state is the latest change at or before that time. current holds
+    the latest value per key for diffing and "what changed since" queries.
+    """
+
+    def __init__(self, path: str = 'records_history.db'):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(schema)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, records: pd.DataFrame, times: Optional[Dict[str, float]] = None,
+               now: Optional[float] = None, complete: bool = True) -> int:
+        """Append the changes of a (player, minigame, map, value) snapshot, returning how many
+
+        times gives the capture time per player, other players are recorded
+        at now. With complete, records missing for a player of the snapshot
+        are recorded as removed. Values older than the stored ones are
+        ignored, the history only moves forward.
+        """
+        now = time.time() if now is None else now
+        times = times or {}
+        current = {(player, minigame, map_name): (recorded, value) for player, minigame, map_name, recorded, value
+                   in self.db.execute("SELECT player, minigame, map, recorded, value FROM current")}
+
+        rows = []
+        seen = set()
+        for player, minigame, map_name, value in records[['player', 'minigame', 'map', 'value']].itertuples(index=False):
+            key = (player, minigame, map_name)
+            seen.add(key)
+            rows.append(self._change(current, key, float(value), times.get(player, now)))
+
+        if complete:
+            players = set(records['player'])
+            for key, (_, value) in current.items():
+                if key[0] in players and key not in seen and value is not None:
+                    rows.append(self._change(current, key, None, times.get(key[0], now)))
+
+        rows = [row for row in rows if row is not None]
+        with self.db:
+            self.db.executemany("INSERT INTO changes (player, minigame, map, recorded, value, previous) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT OR REPLACE INTO current (player, minigame, map, recorded, value) "
+                                "VALUES (?, ?, ?, ?, ?)", [row[:5] for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def _change(current: dict, key: tuple, value: Optional[float], recorded: float) -> Optional[tuple]:
+        old = current.get(key)
+        if old is not None and (old[1] == value or recorded <= old[0]):
+            return None
+        return key + (recorded, value, old[1] if old else None)
+
+    def current_minigames(self) -> Dict[str, set]:
+        """Minigames each player currently holds a record in"""
+        minigames = {}
+        for player, minigame in self.db.execute("SELECT DISTINCT player, minigame FROM current WHERE value IS NOT NULL"):
+            minigames.setdefault(player, set()).add(minigame)
+        return minigames
+
+    def changes_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+
+    # queries
+
+    def changed_since(self, since: Any, minigame: Optional[str] = None) -> pd.DataFrame:
+        """Records whose value changed after since, with their value then ('before') and now ('after')"""
+        since = parse_time(since)
+        query = ("SELECT c.player, c.minigame, c.map, c.recorded, "
+                 "(SELECT h.value FROM changes h WHERE h.player = c.player AND h.minigame = c.minigame "
+                 "AND h.map = c.map AND h.recorded <= ? ORDER BY h.recorded DESC LIMIT 1) AS before, "
+                 "c.value AS after FROM current c WHERE c.recorded > ?")
+        parameters = [since, since]
+        if minigame is not None:
+            query += " AND c.minigame = ?"
+            parameters.append(minigame)
+
+        changed = pd.DataFrame(self.db.execute(query + " ORDER BY c.recorded, c.player", parameters).fetchall(),
+                               columns=['player', 'minigame', 'map', 'recorded', 'before', 'after'])
+        changed['before'] = changed['before'].astype(float)
+        changed['after'] = changed['after'].astype(float)
+        return changed
+
+    def improved_since(self, since: Any, minigame: Optional[str] = None) -> pd.DataFrame:
+        """Records that are better now than at since, new records included (before is NaN)"""
+        changed = self.changed_since(since, minigame)
+        improved = [
+            pd.notna(row.after) and is_better(row.minigame, row.after, None if pd.isna(row.before) else row.before)
+            for row in changed.itertuples(index=False)
+        ]
+        return changed[improved].reset_index(drop=True)
+
+    def progression(self, player: str, minigame: str, map_name: str) -> List[Tuple[float, Optional[float]]]:
+        """(recorded, value) of every change of one record, oldest first"""
+        return self.db.execute(
+            "SELECT recorded, value FROM changes WHERE player = ? AND minigame = ? AND map = ? ORDER BY recorded",
+            (player, minigame, map_name)).fetchall()
+
+    def values_at(self, minigame: str, map_name: str, when: Any) -> Dict[str, float]:
+        """Every player's value on a map as it was at when"""
+        when = parse_time(when)
+        rows = self.db.execute(
+            "SELECT h.player, h.value FROM changes h WHERE h.minigame = ? AND h.map = ? AND h.recorded = "
+            "(SELECT MAX(recorded) FROM changes WHERE player = h.player AND minigame = h.minigame "
+            "AND map = h.map AND recorded <= ?)", (minigame, map_name, when))
+        return {player: value for player, value in rows if value is not None}
+
+    def leader_at(self, minigame: str, map_name: str, when: Any) -> Optional[Tuple[str, float]]:
+        """(player, value) holding #1 on a map at when, ties go to the player with the lower name"""
+        leader = None
+        for player, value in sorted(self.values_at(minigame, map_name, when).items()):
+            if leader is None or is_better(minigame, value, leader[1]):
+                leader = (player, value)
+        return leader
+
+    def leader_history(self, minigame: str, map_name: str) -> List[Dict[str, Any]]:
+        """Every change of the #1 on a map: since when, who and with which value
+
+        A new leader has to beat the old one, a tie keeps the earlier holder.
+        """
+        values = {}
+        leader = None
+        timeline = []
+
+        rows = self.db.execute("SELECT recorded, player, value FROM changes WHERE minigame = ? AND map = ? "
+                               "ORDER BY recorded, player", (minigame, map_name)).fetchall()
+        for i, (recorded, player, value) in enumerate(rows):
+            if value is None:
+                values.pop(player, None)
+            else:
+                values[player] = value
+
+            # only judge once every change of this timestamp is applied
+            if i + 1 < len(rows) and rows[i + 1][0] == recorded:
+                continue
+
+            best = leader if leader is not None and values.get(leader[0]) == leader[1] else None
+            for candidate in sorted(values.items()):
+                if best is None or is_better(minigame, candidate[1], best[1]):
+                    best = candidate
+
+            if best != leader:
+                leader = best
+                timeline.append({"since": recorded, "player": best[0] if best else None,
+                                 "value": best[1] if best else None})
+
+        return timeline
+
+    # imports
+
+    def import_snapshot(self, path: str, minigame: Optional[str] = None, recorded: Optional[float] = None) -> int:
+        """Append a saved {player: {map: value}} minigame JSON like out/snapshots/<minigame>--<date>--.json"""
+        match = snapshot_name.match(os.path.basename(path))
+        if minigame is None or recorded is None:
+            if match is None:
+                raise ValueError(f"{path}: pass minigame and recorded for files not named <minigame>--<date>--.json")
+            minigame = minigame or match['minigame']
+            recorded = recorded if recorded is not None else parse_time(match['date'])
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        records = pd.DataFrame([(player, minigame, map_name, value) for player, scores in data.items()
+                                for map_name, value in scores.items() if value is not None],
+                               columns=['player', 'minigame', 'map', 'value'])
+        # a snapshot holds a single minigame, so absent records of other minigames are not removals
+        return self.record(records, now=recorded, complete=False)
+
+
+def broken_captures(history: RecordHistory, records: pd.DataFrame, directory: str = 'in-new') -> Dict[str, str]:
+    """Players whose capture fails scrape.validate_capture or lacks a minigame they hold records in, with why
+
+    Records don't disappear, so a capture like that is truncated and its
+    missing records are no removals.
+    """
+    import scrape
+
+    held = history.current_minigames()
+    captured = records.groupby('player')['minigame'].unique()
+    broken = {}
+    for player, path in ingest.player_files(directory).items():
+        error = scrape.validate_capture(path, min_lines=0)
+        if error is None and player in held:
+            missing = sorted(held[player] - set(captured.get(player, [])))
+            error = f"missing {', '.join(missing)}" if missing else None
+        if error is not None:
+            broken[player] = error
+    return broken
+
+
+def record_captures(history: RecordHistory, frames: Dict[str, pd.DataFrame], directory: str = 'in-new') -> int:
+    """Append the normalized frames of a rebuild, each player at the commit time of their capture
+
+    Broken captures are skipped and listed, the player's history stays as it was.
+    """
+    records = normalize.frames_to_records(frames)
+    broken = broken_captures(history, records, directory)
+    if broken:
+        print(f"Skipped {len(broken)} broken captures: "
+              + ", ".join(f"{player} ({error})" for player, error in sorted(broken.items())))
+        records = records[~records['player'].isin(list(broken))]
+
+    times = {player: captured for player, captured in ingest.capture_times(list(records['player'].unique()), directory).items()
+             if captured is not None}
+    changed = history.record(records, times=times)
+    print(f"Recorded {changed} record changes in {history.path}")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record history of the tooltip captures")
+    parser.add_argument('--db', default='records_history.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('record', help="append the changes of the current captures")
+    import_parser = commands.add_parser('import', help="append saved <minigame>--<date>--.json snapshots")
+    import_parser.add_argument('paths', nargs='+')
+    improved_parser = commands.add_parser('improved', help="records improved since a date")
+    improved_parser.add_argument('since')
+    improved_parser.add_argument('--minigame')
+    leaders_parser = commands.add_parser('leaders', help="who held #1 on a map over time")
+    leaders_parser.add_argument('minigame')
+    leaders_parser.add_argument('map')
+    args = parser.parse_args()
+
+    with RecordHistory(args.db) as history:
+        if args.command == 'record':
+            record_captures(history, export.minigame_frames(ingest.load_records('in-new', cache=ingest.ParseCache())))
+        elif args.command == 'import':
+            # oldest first, the history only moves forward
+            for path in sorted(args.paths, key=lambda path: os.path.basename(path).split('--')[1:2]):
+                print(f"{path}: {history.import_snapshot(path)} changes")
+        elif args.command == 'improved':
+            print(history.improved_since(args.since, args.minigame).to_string(index=False))
+        else:
+            for change in history.leader_history(args.minigame, args.map):
+                since = datetime.fromtimestamp(change["since"]).strftime('%Y-%m-%d %H:%M')
+                print(f"  {since}: {change['player']} ({change['value']})")
@@ -0,0 +1,392 @@
+import os
+import re
+import json
+import hashlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import instrument
+
+
+point_minigames = ["Sammelwahn", "Schießstand", "Mauerfall", "Survivalgames", "Skywars", "Lasertag",
+                   "Minengefecht", "Einer im Köcher", "Paintball", "Spleef", "Buntes Chaos", "Reihenfolge",
+                   "Duelle", "Turmroulette"]
+time_minigames = ["Wettrennen", "Parkour", "Pferderennen", "Drachenflucht", "Replika", "Blockhüpfer",
+                  "Todeswürfel", "Freier Fall", "Elytrarennen", "Waffenfolge", "Minenfeld", "Kletterkönig",
+                  "Ampelrennen", "Hoch hinaus", "Frostiger Pfad", "Runterpurzeln"]
+minigames = point_minigames + time_minigames
+
+inactive_minigames = ["Paintball", "Freier Fall"]
+
+time_pattern = re.compile(r'(\w+\s?\w+)\s*:\s*(?:(\d+)\s*min\s*)?(?:(\d+)\s*s\s*)?(\d+)\s*ms')
+point_pattern = re.compile(r'(\w+\s?\w+)\s*:\s*(\d+)')
+
+# A parsed file maps each minigame line found in it to its (map, value) pairs
+ParsedFile = Dict[str, List[Tuple[str, float]]]
+
+# Bump whenever parsing changes so cached results of the old parser are discarded
+parser_version = 1
+
+
+def decode_text(raw: bytes) -> str:
+    """Decode a tooltip export, falling back to latin-1 for files that are not utf-8"""
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def read_bytes(path: str) -> Optional[bytes]:
+    """Read the raw bytes of a tooltip export"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        print(f"Error: Could not read {path}. {e}")
+        return None
+
+
+def read_file(path: str) -> Optional[str]:
+    """Read a tooltip export as text"""
+    raw = read_bytes(path)
+    if raw is None:
+        return None
+    return decode_text(raw)
+
+
+def parse_values(data: str, minigame: str) -> List[Tuple[str, float]]:
+    """Parse the map/value pairs of a single minigame line"""
+    values = {}
+
+    if minigame in time_minigames:
+        for map_name, minutes, seconds, millis in time_pattern.findall(data):
+            values[map_name] = int(minutes or 0) * 60 + (int(seconds or 0) + int(millis) / 1000)
+    else:
+        for map_name, points in point_pattern.findall(data):
+            values[map_name] = int(points)
+
+    return list(values.items())
+
+
+def parse_text(text: str) -> ParsedFile:
+    """Parse every TooltipEvent line of a tooltip export in one pass"""
+    parsed = {}
+
+    for line in text.replace('TooltipEvent, ', '').split('\n'):
+        for minigame in minigames:
+            # like the notebooks, the first line mentioning a minigame is the one that counts
+            if minigame in parsed or minigame not in line:
+                continue
+            parsed[minigame] = parse_values(line.replace(minigame, '').strip(), minigame)
+
+    return parsed
+
+
+def parse_file(path: str) -> ParsedFile:
+    """Read and parse a single tooltip export"""
+    text = read_file(path)
+    if text is None:
+        return {}
+    return parse_text(text)
+
+
+def parse_shard(paths: List[str]) -> List[Tuple[str, Optional[str], ParsedFile]]:
+    """Parse a shard of tooltip exports into (path, sha1, records) chunks
+
+    Module-level so it can be shipped to ProcessPoolExecutor workers.
+    """
+    chunks = []
+    for path in paths:
+        raw = read_bytes(path)
+        if raw is None:
+            chunks.append((path, None, {}))
+        else:
+            chunks.append((path, hashlib.sha1(raw).hexdigest(), parse_text(decode_text(raw))))
+    return chunks
+
+
+def parse_paths(paths: List[str], workers: Optional[int] = None, serial: bool = False,
+                shard_size: int = 64) -> List[Tuple[str, Optional[str], ParsedFile]]:
+    """Parse tooltip exports, sharded across a process pool
+
+    The chunks come back in the order of paths no matter how the shards were
+    scheduled, so the result is identical to serial mode. serial=True (or a
+    single shard) parses in-process, which is easier to debug.
+    """
+    shards = [paths[i:i + shard_size] for i in range(0, len(paths), shard_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if serial or workers < 2 or len(shards) < 2:
+        return parse_shard(paths)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        # executor.map yields in submission order, merging is a single concatenation
+        return [chunk for chunks in executor.map(parse_shard, shards) for chunk in chunks]
+
+
+def player_files(directory: str = 'in-new') -> Dict[str, str]:
+    """Map player names to their tooltip export in directory"""
+    return {
+        filename[:-4]: os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if filename.endswith('.txt')
+    }
+
+
+def commit_times(directory: str = 'in-new') -> Dict[str, float]:
+    """Time of the last commit of every committed, unmodified file in directory, {} outside a git checkout
+
+    Unlike the mtime, which is the checkout time in CI, this stays the same
+    from run to run. Needs the full history (fetch-depth: 0 on Actions).
+    """
+    git = ['git', '-c', 'core.quotePath=false', '-C', directory]
+    try:
+        log = subprocess.run(git + ['log', '--relative', '--format=%x00%ct', '--name-only', '--', '.'],
+                             capture_output=True, text=True, encoding='utf-8', check=True).stdout
+        modified = subprocess.run(git + ['diff', '--relative', '--name-only', 'HEAD', '--', '.'],
+                                  capture_output=True, text=True, encoding='utf-8', check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+
+    times = {}
+    for commit in log.split('\0')[1:]:
+        timestamp, *filenames = commit.split('\n')
+        for filename in filenames:
+            if filename and filename not in times:
+                times[filename] = float(timestamp)
+    for filename in modified.split('\n'):
+        times.pop(filename, None)
+    return times
+
+
+def capture_times(player_names: List[str], directory: str = 'in-new') -> Dict[str, Optional[float]]:
+    """Commit time of each player's capture in directory, the mtime if it is not committed, None if there is none"""
+    files = player_files(directory)
+    committed = commit_times(directory)
+
+    times = {}
+    for player in player_names:
+        path = files.get(player)
+        if path is None:
+            times[player] = None
+        else:
+            times[player] = committed.get(os.path.basename(path)) or os.path.getmtime(path)
+    return times
+
+
+class ParseCache:
+    """On-disk cache of parsed tooltip exports
+
+    Entries are keyed by file path and validated by size and mtime first,
+    then by content hash, so a rebuild only re-parses new or changed files.
+    """
+
+    def __init__(self, path: str = 'parse_cache.json'):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self._dirty = False
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable parse cache {path}: {e}")
+                data = {}
+            if data.get('version') == parser_version:
+                self.entries = data.get('files', {})
+
+    def lookup(self, path: str) -> Optional[ParsedFile]:
+        """Return the cached records of path, or None if it has to be parsed"""
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+
+        stat = os.stat(path)
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            self.hits += 1
+            instrument.count("parse_cache_hits")
+            return self._decode(entry['records'])
+
+        raw = read_bytes(path)
+        if raw is not None and hashlib.sha1(raw).hexdigest() == entry['sha1']:
+            # touched but identical content, e.g. a re-capture of an unchanged record set
+            entry['size'] = stat.st_size
+            entry['mtime'] = stat.st_mtime_ns
+            self._dirty = True
+            self.hits += 1
+            instrument.count("parse_cache_hits")
+            return self._decode(entry['records'])
+
+        return None
+
+    def store(self, path: str, digest: Optional[str], parsed: ParsedFile):
+        """Remember the freshly parsed records of path"""
+        self.misses += 1
+        if digest is None:
+            return
+
+        stat = os.stat(path)
+        self.entries[path] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha1': digest,
+            'records': parsed,
+        }
+        self._dirty = True
+
+    def get(self, path: str) -> ParsedFile:
+        """Return the parsed records of path, parsing it only on a cache miss"""
+        parsed = self.lookup(path)
+        if parsed is None:
+            _, digest, parsed = parse_shard([path])[0]
+            self.store(path, digest, parsed)
+        return parsed
+
+    def prune(self, paths: List[str]):
+        """Drop entries of files that no longer exist"""
+        keep = set(paths)
+        for path in [path for path in self.entries if path not in keep]:
+            del self.entries[path]
+            self.dropped += 1
+            self._dirty = True
+
+    def save(self):
+        """Write the cache back to disk if anything changed"""
+        if not self._dirty:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': parser_version, 'files': self.entries}, f, ensure_ascii=False)
+        self._dirty = False
+
+    def summary(self) -> str:
+        """One-line hit/miss report"""
+        return f"Parse cache: {self.hits} hits, {self.misses} parsed, {self.dropped} dropped"
+
+    @staticmethod
+    def _decode(records: Dict[str, list]) -> ParsedFile:
+        return {minigame: [tuple(pair) for pair in pairs] for minigame, pairs in records.items()}
+
+
+class RecordTable:
+    """Long-format (player, minigame, map, value, unit) record table
+
+    Every per-minigame frame is derived from the one table, so the tooltip
+    exports only have to be read once per rebuild.
+    """
+
+    columns = ['player', 'minigame', 'map', 'value', 'unit']
+
+    def __init__(self, parsed: Dict[str, ParsedFile]):
+        rows = {column: [] for column in self.columns}
+        self.members = {minigame: [] for minigame in minigames}
+
+        for player in sorted(parsed):
+            player_records = parsed[player]
+
+            for minigame in minigames:
+                pairs = player_records.get(minigame)
+
+                # point games skip players without a line, time games list them without records
+                if pairs is None and minigame in point_minigames:
+                    continue
+                self.members[minigame].append(player)
+
+                unit = 's' if minigame in time_minigames else 'points'
+                for map_name, value in pairs or ():
+                    rows['player'].append(player)
+                    rows['minigame'].append(minigame)
+                    rows['map'].append(map_name)
+                    rows['value'].append(float(value))
+                    rows['unit'].append(unit)
+
+        self.records = pd.DataFrame(rows, columns=self.columns)
+        self._groups = {minigame: group for minigame, group in self.records.groupby('minigame', sort=False)}
+        self._frames = {}
+
+    @property
+    def players(self) -> List[str]:
+        """All players with a tooltip export"""
+        return sorted(set().union(*self.members.values()))
+
+    def minigame_records(self, minigame: str) -> pd.DataFrame:
+        """Long-format records of a single minigame"""
+        group = self._groups.get(minigame)
+        if group is None:
+            return self.records.iloc[0:0]
+        return group
+
+    def frame(self, minigame: str) -> pd.DataFrame:
+        """Wide player x map frame of a minigame, as the notebooks used to build it"""
+        if minigame not in self._frames:
+            group = self.minigame_records(minigame)
+            maps = list(dict.fromkeys(group['map']))
+
+            if len(group):
+                frame = group.pivot(index='player', columns='map', values='value')
+            else:
+                frame = pd.DataFrame()
+            frame = frame.reindex(index=self.members.get(minigame, []), columns=maps)
+            frame.index.name = None
+            frame.columns.name = None
+
+            if minigame in point_minigames:
+                # complete point columns stay integers, as they did when frames were concatenated
+                complete = [column for column in frame.columns if frame[column].notna().all()]
+                frame = frame.astype({column: 'int64' for column in complete})
+
+            self._frames[minigame] = frame
+
+        # hand out copies so the notebook fixups can't corrupt the cached view
+        return self._frames[minigame].copy()
+
+
+@instrument.traced("ingest")
+def load_records(directory: str = 'in-new', cache: Optional[ParseCache] = None,
+                 workers: Optional[int] = None, serial: bool = False) -> RecordTable:
+    """Read every tooltip export in directory exactly once and build the record table
+
+    With a ParseCache only new or changed files are parsed; the cache is
+    pruned of deleted files and saved afterwards. Files that need parsing are
+    sharded across workers processes (all cores by default) unless serial.
+    """
+    files = player_files(directory)
+    players = {path: player for player, path in files.items()}
+
+    parsed = {}
+    pending = []
+    for player, path in files.items():
+        hit = cache.lookup(path) if cache is not None else None
+        if hit is None:
+            pending.append(path)
+        else:
+            parsed[player] = hit
+
+    with instrument.span("parse"):
+        chunks = parse_paths(pending, workers=workers, serial=serial)
+
+    for path, digest, records in chunks:
+        parsed[players[path]] = records
+        if cache is not None:
+            cache.store(path, digest, records)
+
+    if instrument.enabled:
+        # counted here, the parsing itself may happen in worker processes
+        instrument.count("files_parsed", len(pending))
+        instrument.count("bytes_read", sum(os.path.getsize(path) for path in pending))
+
+    if cache is not None:
+        cache.prune(list(files.values()))
+        cache.save()
+        print(cache.summary())
+
+    table = RecordTable(parsed)
+    instrument.count("rows_parsed", len(table.records))
+    return table
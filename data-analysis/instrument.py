@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional
+
+
+# Tracing is off unless enabled, either with enable() or by setting MCP_TRACE to
+# the trace file path. MCP_PROFILE is a comma separated list of spans to run under
+# cProfile, their stats are written next to the trace as <span>.prof.
+enabled = False
+trace_path = None
+profile_spans = set()
+
+spans = []
+counters = {}
+
+_lock = threading.Lock()
+_started = None
+_disabled = nullcontext()
+# only one cProfile.Profile can be enabled in a process at a time
+_profiling = False
+
+
+def enable(path: Optional[str] = 'trace.json', profile: Optional[List[str]] = None):
+    """Start recording spans and counters"""
+    global enabled, trace_path, profile_spans, _started
+    enabled = True
+    trace_path = path
+    profile_spans = set(profile or ())
+    _started = time.perf_counter()
+    spans.clear()
+    counters.clear()
+
+
+def count(name: str, amount: float = 1):
+    """Add amount to a counter"""
+    if not enabled:
+        return
+    with _lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def span(name: str):
+    """Context manager timing a block as one span"""
+    if not enabled:
+        return _disabled
+    return _span(name)
+
+
+def _start_profile(name: str) -> Optional[cProfile.Profile]:
+    """Profiler for a span in profile_spans, None if another profiled span is running
+
+    A profiled span inside another one, or in a worker thread during one,
+    is covered by the outer profile.
+    """
+    global _profiling
+    if name not in profile_spans:
+        return None
+    with _lock:
+        if _profiling:
+            return None
+        _profiling = True
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # a profiler outside of instrument is running
+        with _lock:
+            _profiling = False
+        return None
+    return profiler
+
+
+@contextmanager
+def _span(name: str):
+    global _profiling
+    profiler = _start_profile(name)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            with _lock:
+                _profiling = False
+            profiler.dump_stats(os.path.join(os.path.dirname(trace_path or '') or '.', f"{name}.prof"))
+
+        with _lock:
+            spans.append({"name": name, "start": start - _started, "duration": duration,
+                          "thread": threading.get_ident()})
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording every call of a function as a span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def totals() -> Dict[str, Dict[str, float]]:
+    """Call count and total seconds per span name, in first-seen order"""
+    result = {}
+    for entry in spans:
+        total = result.setdefault(entry["name"], {"calls": 0, "seconds": 0.0})
+        total["calls"] += 1
+        total["seconds"] += entry["duration"]
+    return result
+
+
+def summary() -> str:
+    """One-line summary of the run: wall time, spans and counters"""
+    parts = [f"total {time.perf_counter() - _started:.2f}s"]
+    for name, total in totals().items():
+        calls = f" x{total['calls']}" if total["calls"] > 1 else ""
+        parts.append(f"{name} {total['seconds']:.2f}s{calls}")
+    parts += [f"{name}={value:g}" for name, value in counters.items()]
+    return " | ".join(parts)
+
+
+def write_trace(path: str):
+    """Write the spans in Chrome trace event format (chrome://tracing, Perfetto) plus the counters"""
+    events = [{
+        "name": entry["name"], "ph": "X", "pid": os.getpid(), "tid": entry["thread"],
+        "ts": round(entry["start"] * 1e6), "dur": round(entry["duration"] * 1e6),
+    } for entry in spans]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "counters": counters, "totals": totals()}, f, indent=1)
+
+
+def finish():
+    """Write the trace and print the summary line, if tracing is on"""
+    if not enabled:
+        return
+    if trace_path:
+        write_trace(trace_path)
+    print(f"[trace] {summary()}")
+
+
+if os.environ.get('MCP_TRACE'):
+    enable(os.environ['MCP_TRACE'], [name for name in os.environ.get('MCP_PROFILE', '').split(',') if name])
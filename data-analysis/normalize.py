@@ -0,0 +1,245 @@
+import operator
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+
+# Repairs of parser artefacts per minigame, compiled into one pass over the columns:
+#   aliases        {source: target}, source values fill the gaps of target and source is dropped
+#   kill_variants  merge "Kill X" / "Kills X" into "X" (see merge_duplicate_columns)
+#   zero_missing   columns in which 0 means "no record"
+#   fill           value for the gaps left after merging
+#   keep           (operator, bound, replacement), values failing "value <operator> bound" are replaced
+#   sum            {"column", "missing"}, row sum column put first, gaps count as missing (default 0)
+#   strip          text removed from the column names after ordering
+# Columns are sorted by name, except that a sum column comes first.
+normalization_rules = {
+    "Replika": {
+        "aliases": {"ms Arrow": "Arrow", "ms Cow": "Cow", "ms Deadpool": "Deadpool", "ms Doge": "Doge", "ms Sonic": "Sonic"},
+        # 25 s for a never played pattern: 17 perturbs the order of worse players and alt accounts,
+        # 27 is probably too much, difficult to choose an appropriate value here
+        "sum": {"column": "Sum", "missing": 25},
+    },
+    "Sammelwahn": {
+        "sum": {"column": "Sum"},
+        "strip": "Punkte",
+    },
+    "Schießstand": {
+        "aliases": {"Punkte City": "City", "Punkte Jungle": "Jungle"},
+        "zero_missing": ["City", "Punkte City", "Punkte Jungle"],
+    },
+    "Buntes Chaos": {
+        "aliases": {"Runden Cyberpunk": "Cyberpunk"},
+        "fill": 0,
+    },
+    "Pferderennen": {
+        "aliases": {"s Arena": "Wario's Arena"},
+        "zero_missing": ["s Arena"],
+    },
+    "Frostiger Pfad": {"keep": ("<", 100, np.nan)},
+    "Duelle": {"keep": (">", 10, 0.0)},
+    "Lasertag": {"kill_variants": True},
+    "Einer im Köcher": {"kill_variants": True},
+    "Paintball": {"kill_variants": True},
+    "Skywars": {"kill_variants": True},
+    "Survivalgames": {"kill_variants": True},
+    "Minengefecht": {"kill_variants": True},
+    "Mauerfall": {"kill_variants": True},
+}
+
+comparisons = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def kill_variant_aliases(columns: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Aliases merging "Kill X" / "Kills X" columns into "X", and the columns whose zeros are gaps
+
+    Priority: Base > Kills > Kill. Where no base column exists the Kills
+    (or else Kill) variant becomes the target and keeps its name.
+    """
+    groups = defaultdict(dict)
+    for column in columns:
+        if column.startswith("Kill "):
+            groups[column[5:]]["kill"] = column
+        elif column.startswith("Kills "):
+            groups[column[6:]]["kills"] = column
+        else:
+            groups[column]["base"] = column
+
+    aliases = {}
+    zero_missing = []
+    for variants in groups.values():
+        if len(variants) < 2:
+            continue
+        merge_order = [variants[kind] for kind in ("base", "kills", "kill") if kind in variants]
+        for column in merge_order[1:]:
+            aliases[column] = merge_order[0]
+            zero_missing.append(column)
+
+    return aliases, zero_missing
+
+
+def merge_sources(columns: List[str], aliases: Dict[str, str]) -> Dict[str, List[str]]:
+    """Input columns per output column, in merge order
+
+    A target's own column comes first, then its aliases in the order they
+    are listed. Output columns take the position of the target column, or
+    of their first alias if there is none.
+    """
+    sources = {}
+    for column in columns:
+        target = aliases.get(column, column)
+        if column != target and target in columns:
+            continue
+        sources[target] = [target] if target in columns else []
+
+    for source, target in aliases.items():
+        if source in columns:
+            sources[target].append(source)
+    return sources
+
+
+class NormalizationPlan:
+    """Rules of a minigame compiled against the columns of its frame
+
+    sources lists, per output column in merge order, the input columns
+    whose values are coalesced into it (first non-null wins). issues
+    collects rules that did not apply to these columns.
+    """
+
+    def __init__(self, minigame: str, columns: Tuple[str, ...]):
+        rules = normalization_rules.get(minigame, {})
+        self.minigame = minigame
+        self.issues = []
+
+        aliases = dict(rules.get("aliases", {}))
+        zero_missing = list(rules.get("zero_missing", []))
+        if rules.get("kill_variants"):
+            variant_aliases, variant_zeros = kill_variant_aliases(list(columns))
+            aliases.update(variant_aliases)
+            zero_missing += variant_zeros
+
+        for source, target in aliases.items():
+            if source not in columns:
+                self.issues.append(f"alias {source!r} -> {target!r} not applied, no {source!r} column")
+        for column in zero_missing:
+            if column not in columns:
+                self.issues.append(f"zero_missing not applied to {column!r}, no such column")
+
+        self.sources = merge_sources(list(columns), aliases)
+
+        self.zero_missing = set(zero_missing) & set(columns)
+        self.fill = rules.get("fill")
+        self.keep = rules.get("keep")
+        self.sum = rules.get("sum")
+        self.strip = rules.get("strip")
+
+        names = sorted(self.sources)
+        if self.sum is not None:
+            names = [self.sum["column"]] + [name for name in names if name != self.sum["column"]]
+        self.order = names
+
+
+_plans = {}
+
+
+def compile_plan(minigame: str, columns: Tuple[str, ...]) -> NormalizationPlan:
+    """Compiled plan of a minigame for a column layout, reporting unapplied rules once"""
+    key = (minigame, columns)
+    if key not in _plans:
+        plan = NormalizationPlan(minigame, columns)
+        for issue in plan.issues:
+            print(f"Warning, {minigame}: {issue}")
+        _plans[key] = plan
+    return _plans[key]
+
+
+def normalize_frame(outDf: pd.DataFrame, minigame: str) -> pd.DataFrame:
+    """Minigame specific repairs of the raw player x map frame
+
+    The rules of normalization_rules are applied column by column and the
+    result is assembled once; the input frame is left untouched.
+    """
+    plan = compile_plan(minigame, tuple(outDf.columns))
+
+    columns = {}
+    for target, sources in plan.sources.items():
+        values = None
+        for source in sources:
+            column = outDf[source]
+            if source in plan.zero_missing:
+                column = column.replace(0, np.nan)
+            values = column if values is None else values.fillna(column)
+
+        if plan.fill is not None:
+            values = values.fillna(plan.fill)
+        if plan.keep is not None:
+            comparison, bound, replacement = plan.keep
+            values = values.where(comparisons[comparison](values, bound), replacement)
+        columns[target] = values
+
+    if plan.sum is not None:
+        merged = pd.DataFrame(columns, index=outDf.index)
+        missing = plan.sum.get("missing")
+        columns[plan.sum["column"]] = (merged if missing is None else merged.fillna(missing)).sum(axis=1)
+
+    result = pd.DataFrame(columns, index=outDf.index, columns=plan.order)
+    if plan.strip:
+        result.columns = [name.replace(plan.strip, '') for name in plan.order]
+    return result
+
+
+def merge_duplicate_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merges columns that are duplicates following the pattern:
+    - Base column (e.g., "Oasis")
+    - Kill variant (e.g., "Kill Oasis")
+    - Kills variant (e.g., "Kills Oasis")
+
+    Priority: Base > Kills > Kill (first non-null value wins), zeros of the
+    merged-in variants count as missing.
+    """
+    aliases, zero_missing = kill_variant_aliases(list(df.columns))
+
+    columns = {}
+    for target, sources in merge_sources(list(df.columns), aliases).items():
+        values = None
+        for source in sources:
+            column = df[source].replace(0, np.nan) if source in zero_missing else df[source]
+            values = column if values is None else values.fillna(column)
+        columns[target] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def frames_to_records(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Long-format (player, minigame, map, value) records of per-minigame frames"""
+    parts = []
+
+    for minigame, frame in frames.items():
+        frame = frame.copy()
+        frame.index.name = 'player'
+        frame.columns.name = 'map'
+
+        long = frame.stack().dropna().rename('value').reset_index()
+        long.insert(1, 'minigame', minigame)
+        parts.append(long)
+
+    return pd.concat(parts, ignore_index=True)
+
+
+def normalized_records(table: ingest.RecordTable, skip_inactive: bool = True) -> pd.DataFrame:
+    """Long-format (player, minigame, map, value) records after the minigame repairs"""
+    frames = {
+        minigame: normalize_frame(table.frame(minigame), minigame)
+        for minigame in ingest.minigames
+        if not (skip_inactive and minigame in ingest.inactive_minigames)
+    }
+    return frames_to_records(frames)
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, Optional
+
+import export
+
+
+# Versioned delta updates of the scoreboard data for returning visitors.
+#
+# updates/manifest.json names the current data version, the full snapshot and
+# one patch per recent version that leads straight to the current one:
+#
+#     {"format": 2, "version": 42, "updated": "...", "snapshot": "snapshot-42.json",
+#      "patches": {"40": "patch-40-42.json", "41": "patch-41-42.json"}}
+#
+# A patch holds, per dataset, the keys to set and the keys to delete. The page
+# fetches the manifest, then the patch from its cached version if there is
+# one, and the snapshot otherwise. Records are keyed '<minigame>/<name>'; their
+# order is not part of the data, the page sorts them itself. The snapshot holds
+# the records as the compact export (export.compact_records), the page expands
+# them before keying.
+
+patch_format = 2
+
+datasets = {
+    "records": "records_data.min.json",
+    "player_data": "player_data.json",
+    "player_uuids": "player_uuids.json",
+}
+
+
+def record_key(record: Dict[str, Any]) -> str:
+    return f"{record['minigame']}/{record['name']}"
+
+
+def read_exports(directory: str = '.') -> Dict[str, Any]:
+    """The exported JSON files the page loads, as they are written"""
+    return {name: read_json(directory, filename) for name, filename in datasets.items()}
+
+
+def keyed(exports: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """State of the exports or a snapshot, with the compact records expanded and keyed"""
+    state = {name: exports[name] for name in datasets}
+    state["records"] = {record_key(record): record for record in export.expand_compact(exports["records"])}
+    return state
+
+
+def load_state(directory: str = '.') -> Dict[str, Dict[str, Any]]:
+    """Keyed form of the exported JSON files the page loads"""
+    return keyed(read_exports(directory))
+
+
+def diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Patch turning state old into state new, datasets without changes are left out"""
+    patch = {}
+    for name in datasets:
+        before = old.get(name, {})
+        after = new.get(name, {})
+        changes = {
+            "set": {key: value for key, value in after.items() if key not in before or before[key] != value},
+            "delete": sorted(key for key in before if key not in after),
+        }
+        if changes["set"] or changes["delete"]:
+            patch[name] = changes
+    return patch
+
+
+def compose(first: Dict[str, Dict[str, Any]], second: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """One patch with the effect of applying first, then second"""
+    patch = {}
+    for name in datasets:
+        if name not in first and name not in second:
+            continue
+        a = first.get(name, {"set": {}, "delete": []})
+        b = second.get(name, {"set": {}, "delete": []})
+
+        deleted = set(b["delete"])
+        changes = {
+            "set": {key: value for key, value in a["set"].items() if key not in deleted and key not in b["set"]},
+            "delete": sorted((set(a["delete"]) - set(b["set"])) | deleted),
+        }
+        changes["set"].update(b["set"])
+        patch[name] = changes
+    return patch
+
+
+def apply_patch(state: Dict[str, Dict[str, Any]], patch: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """New state with a patch applied, state itself is left as is"""
+    result = {name: dict(state.get(name, {})) for name in datasets}
+    for name, changes in patch.items():
+        for key in changes["delete"]:
+            result[name].pop(key, None)
+        result[name].update(changes["set"])
+    return result
+
+
+def patch_changes(patch: Dict[str, Dict[str, Any]]) -> int:
+    return sum(len(changes["set"]) + len(changes["delete"]) for changes in patch.values())
+
+
+def _dump(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write(path: str, payload: bytes):
+    # written next to the target and moved over it, the page never reads a half-written file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(payload)
+    os.replace(path + '.tmp', path)
+
+
+def read_manifest(directory: str = 'updates') -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_json(directory: str, filename: str) -> Any:
+    with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def published_snapshot(directory: str, version: int) -> Optional[Dict[str, Any]]:
+    """Snapshot of an older version as it was committed, None if git has no copy of it
+
+    Only the current snapshot stays in directory, the workflow's commits
+    keep the older ones the patches were made from.
+    """
+    filename = f"snapshot-{version}.json"
+    git = ['git', '-C', directory]
+    try:
+        added = subprocess.run(git + ['log', '-1', '--diff-filter=A', '--format=%H', '--', filename],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        if not added:
+            return None
+        payload = subprocess.run(git + ['show', f"{added}:./{filename}"], capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return json.loads(payload)
+
+
+def update_patches(directory: str = 'updates', source_dir: str = '.', keep: int = 28, max_ratio: float = 0.5,
+                   now: Optional[float] = None) -> int:
+    """Publish the current exports as a new data version if they changed, returning the version
+
+    Every kept patch from an older version is composed with the new step, so
+    a returning page needs a single request whatever its version. Patches
+    from more than keep versions back, or bigger than max_ratio of the
+    snapshot, are dropped; those pages load the snapshot instead.
+    """
+    now = time.time() if now is None else now
+    exports = read_exports(source_dir)
+    state = keyed(exports)
+    manifest = read_manifest(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    if manifest is None:
+        version = 1
+        patches = {}
+    elif manifest.get("format") != patch_format:
+        # older snapshots can't be diffed against, every page loads the new snapshot once
+        version = manifest["version"] + 1
+        patches = {}
+        print(f"Format {manifest.get('format')} in {directory}/, publishing version {version} without patches")
+    else:
+        step = diff(keyed(read_json(directory, manifest["snapshot"])), state)
+        if not step:
+            print(f"Data unchanged, staying at version {manifest['version']}")
+            return manifest["version"]
+
+        version = manifest["version"] + 1
+        patches = {int(old): compose(read_json(directory, filename), step)
+                   for old, filename in manifest["patches"].items() if int(old) > version - keep}
+        patches[manifest["version"]] = step
+        print(f"Version {version}: {patch_changes(step)} changes since version {manifest['version']}")
+
+    snapshot = _dump(dict(exports, version=version))
+    written = {"snapshot": f"snapshot-{version}.json", "patches": {}}
+    _write(os.path.join(directory, written["snapshot"]), snapshot)
+
+    for old in sorted(patches):
+        payload = _dump(dict(patches[old], **{"from": old, "to": version}))
+        if len(payload) > max_ratio * len(snapshot):
+            continue
+        filename = f"patch-{old}-{version}.json"
+        _write(os.path.join(directory, filename), payload)
+        written["patches"][str(old)] = filename
+
+    manifest = {
+        "format": patch_format,
+        "version": version,
+        "updated": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)),
+        "snapshot": written["snapshot"],
+        "patches": written["patches"],
+    }
+    _write(os.path.join(directory, 'manifest.json'), _dump(manifest))
+
+    # files of older versions are only removed once the new manifest is in place
+    current = {written["snapshot"], 'manifest.json'} | set(written["patches"].values())
+    for filename in os.listdir(directory):
+        if filename.endswith('.json') and filename not in current:
+            os.remove(os.path.join(directory, filename))
+
+    print(f"Data version {version} written to {directory}/ with {len(written['patches'])} patches")
+    return version
+
+
+def verify_patches(directory: str = 'updates', source_dir: str = '.',
+                   snapshots: Optional[Dict[int, Dict[str, Any]]] = None) -> bool:
+    """Check the published version against the exports it was made from
+
+    The snapshot has to equal the exports, and every patch has to lead from
+    its version to the current one: applied to the snapshot of the older
+    version, from snapshots or else from git (published_snapshot), it has
+    to give the exports. A patch whose older snapshot can't be found must
+    at least be contained in the current snapshot.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        print(f"No manifest in {directory}/")
+        return False
+
+    snapshots = snapshots or {}
+    snapshot = keyed(read_json(directory, manifest["snapshot"]))
+    current = load_state(source_dir)
+    problems = []
+    if snapshot != current:
+        problems.append(f"{manifest['snapshot']} differs from the exports in {source_dir}")
+
+    unchecked = []
+    for old, filename in manifest["patches"].items():
+        patch = read_json(directory, filename)
+        changes = {name: patch[name] for name in datasets if name in patch}
+        if patch["to"] != manifest["version"] or str(patch["from"]) != old:
+            problems.append(f"{filename} leads from {patch['from']} to {patch['to']}")
+            continue
+
+        before = snapshots.get(int(old)) or published_snapshot(directory, int(old))
+        if before is None:
+            unchecked.append(old)
+            if apply_patch(snapshot, changes) != snapshot:
+                problems.append(f"{filename} does not end at version {manifest['version']}")
+        elif apply_patch(keyed(before), changes) != current:
+            problems.append(f"{filename} applied to version {old} does not give the exports")
+
+    if unchecked:
+        print(f"No snapshot of version {', '.join(unchecked)} to replay its patch on")
+    for problem in problems:
+        print(problem)
+    return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish versioned data patches for the scoreboard")
+    parser.add_argument('--directory', default='updates')
+    parser.add_argument('--keep', type=int, default=28, help="versions a returning page can patch from (28 = one week)")
+    parser.add_argument('--verify', action='store_true', help="only check the published version")
+    args = parser.parse_args()
+
+    if args.verify:
+        raise SystemExit(0 if verify_patches(args.directory) else 1)
+    update_patches(args.directory, keep=args.keep)
@@ -0,0 +1,221 @@
+import os
+import sys
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+
+# Headless replacement for running analysis-v2.ipynb by hand, usable in CI:
+#
+#     python -m pipeline all
+#     python -m pipeline rank --input in-new
+#
+# Only the standard library is imported up front. pandas comes in with the
+# pipeline modules on the first stage that needs them, matplotlib and seaborn
+# only with the plot stage, so `--help` and the light stages start fast and a
+# CI runner without the plotting libraries can run everything else.
+
+stage_names = ["ingest", "normalize", "rank", "export", "history", "patches", "plot"]
+
+
+class Pipeline:
+    """Runs the notebook stages in order, sharing their results
+
+    Every stage pulls what it needs from the earlier ones, so `rank` alone
+    still ingests and normalizes, but `all` does so only once.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.table = None
+        self.frames = None
+
+    def load(self):
+        if self.table is None:
+            import ingest
+
+            cache = None if self.args.no_cache else ingest.ParseCache(self.args.cache)
+            self.table = ingest.load_records(self.args.input, cache=cache)
+            print(f"Ingested {len(self.table.records)} records of "
+                  f"{self.table.records['player'].nunique()} players from {self.args.input}")
+        return self.table
+
+    def normalized(self):
+        if self.frames is None:
+            import export
+
+            self.frames = export.minigame_frames(self.load())
+            print(f"Normalized {len(self.frames)} minigames")
+        return self.frames
+
+    def ingest(self):
+        self.load()
+
+    def normalize(self):
+        import recordstore
+
+        # columnar snapshot for notebooks and lookups, see recordstore.cached_store
+        path = os.path.join(self.args.output, 'records_store.npz')
+        recordstore.RecordStore.from_frames(self.normalized()).save(path, recordstore.source_key(self.args.input))
+        print(f"Record store saved to {path}")
+
+    def rank(self):
+        import normalize
+        import ranking
+
+        scores = ranking.minigame_scores(normalize.frames_to_records(self.normalized()))
+        ranking.write_scores(scores, os.path.join(self.args.output, 'TotalRankingScores.json'),
+                             os.path.join(self.args.output, 'MinigameRankingScores.json'))
+
+        top = ranking.total_scores(scores).head(self.args.top)
+        print(f"\nTop {len(top)}:")
+        for player, points in top.items():
+            print(f"  {player}: {points:.1f}")
+
+    def export(self):
+        import export
+
+        frames = self.normalized()
+        records_file = os.path.join(self.args.output, 'records_data.json')
+        compact_file = os.path.join(self.args.output, 'records_data.min.json')
+
+        if not self.args.no_uuids:
+            export_uuids(frames, os.path.join(self.args.output, 'player_uuids.json'),
+                         store_path=os.path.join(self.args.output, 'players.db'))
+
+        export.export_records_json(frames, records_file)
+        export.export_compact(frames, compact_file)
+        if not export.verify_compact(compact_file, records_file):
+            raise SystemExit(f"{compact_file} does not round-trip, not publishing it")
+        export.export_shards(frames, os.path.join(self.args.output, 'records'))
+
+    def history(self):
+        import history
+
+        with history.RecordHistory(self.args.history) as records:
+            history.record_captures(records, self.normalized(), self.args.input)
+
+    def patches(self):
+        import patches
+
+        directory = os.path.join(self.args.output, 'updates')
+        patches.update_patches(directory, self.args.output)
+        if not patches.verify_patches(directory, self.args.output):
+            raise SystemExit(f"{directory}/ does not match the exports")
+
+    def plot(self):
+        plot_swarms(self.normalized(), os.path.join(self.args.output, 'out', 'allSwarm.png'))
+
+    def run(self, stages: List[str]) -> Dict[str, float]:
+        timings = {}
+        for stage in stages:
+            print(f"== {stage}")
+            start = time.perf_counter()
+            getattr(self, stage)()
+            timings[stage] = time.perf_counter() - start
+        return timings
+
+
+def export_uuids(frames: Dict[str, Any], output_file: str = 'player_uuids.json', store_path: str = 'players.db',
+                 cache: Optional[Any] = None) -> Dict[str, str]:
+    """Add the UUIDs of players new to output_file, without prompting
+
+    Same as export_uuids of the notebook: new names are resolved in batches
+    through the UUID cache, unresolved ones are listed and skipped.
+    """
+    import json
+    import store
+    from uuid_cache import UUIDCache, dashed_uuid
+
+    existing_uuids = {}
+    if os.path.exists(output_file):
+        with open(output_file, 'r') as f:
+            existing_uuids = json.load(f)
+
+    new_players = sorted({player for records in frames.values() for player in records.index} - set(existing_uuids))
+    if new_players:
+        cache = cache or UUIDCache(os.path.join(os.path.dirname(output_file), 'uuid_cache.json'))
+        resolved = cache.uuids_for(new_players)
+        cache.save()
+
+        for player, uuid in resolved.items():
+            if uuid:
+                existing_uuids[player] = dashed_uuid(uuid)
+
+        unresolved = sorted(player for player, uuid in resolved.items() if not uuid)
+        if unresolved:
+            print(f"Could not resolve UUIDs for: {', '.join(unresolved)}")
+
+    with open(output_file, 'w') as f:
+        json.dump(existing_uuids, f, indent=2)
+    with store.PlayerStore(store_path) as players:
+        players.add_players(existing_uuids)
+    print(f"UUIDs exported successfully to {output_file}")
+    return existing_uuids
+
+
+def plot_swarms(frames: Dict[str, Any], path: str = 'out/allSwarm.png'):
+    """Strip plot of every minigame's map scores in one grid, as in the notebook"""
+    import matplotlib
+    matplotlib.use('Agg')  # no display in CI
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid", palette="muted")
+
+    minigames = [minigame for minigame in sorted(frames) if minigame != "Reihenfolge"]
+    fig, ax = plt.subplots(ncols=9, nrows=3, figsize=[20, 10])
+    ax = ax.flatten()
+
+    for i, minigame in enumerate(minigames[:len(ax)]):
+        data = frames[minigame].drop(columns=['Sum'], errors='ignore')
+        sns.stripplot(data=data, ax=ax[i])
+        ax[i].set_title(minigame)
+        ax[i].set_ylabel("")
+        # map names overlap at this size
+        ax[i].set_xticklabels([])
+
+    for i in range(len(minigames), len(ax)):
+        ax[i].axis('off')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    print(f"Plot saved to {path}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m pipeline",
+                                     description="Rebuild the records exports and ranking from the tooltip captures")
+    parser.add_argument('command', choices=stage_names + ["all"],
+                        help="stage to run, earlier stages it depends on run first; 'all' runs every stage but plot")
+    parser.add_argument('--input', default='in-new', help="tooltip capture directory")
+    parser.add_argument('--output', default='.', help="directory the exports are written to")
+    parser.add_argument('--cache', default='parse_cache.json', help="parse cache file")
+    parser.add_argument('--history', default='records_history.db', help="record history store")
+    parser.add_argument('--no-cache', action='store_true', help="parse every capture again")
+    parser.add_argument('--no-uuids', action='store_true', help="skip resolving the UUIDs of new players")
+    parser.add_argument('--plot', action='store_true', help="also save the swarm plot with 'all'")
+    parser.add_argument('--top', type=int, default=10, help="players to print after ranking")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.command == "all":
+        stages = [stage for stage in stage_names if stage != "plot" or args.plot]
+    else:
+        stages = [args.command]
+
+    timings = Pipeline(args).run(stages)
+    print("\n" + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+    import instrument
+    instrument.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import normalize
+import ranking
+from store import PlayerStore, open_store
+
+
+# relative weight of each signal in the re-scrape priority, all signals are scaled to [0, 1]
+weights = {
+    "games_since_capture": 3.0,  # minigames played since the last capture, the best predictor of a change
+    "monthly_time": 1.0,         # monthly MP time of the last stats fetch
+    "capture_age": 1.0,          # days since the last capture
+    "top_records": 1.0,          # holds a top 10 record, so a change moves the ranking
+}
+
+# estimated GUI time per player of an event-driven scrape
+seconds_per_player = 3.0
+
+day = 24 * 60 * 60
+
+
+def top_record_holders(directory: str = 'in-new') -> set:
+    """Players holding at least one top 10 record"""
+    records = normalize.normalized_records(ingest.load_records(directory, cache=ingest.ParseCache()))
+    ranked = ranking.rank_records(records)
+    return set(ranked.loc[ranked['rank'] <= ranking.top_n, 'player'])
+
+
+def games_played(entry: dict) -> Optional[float]:
+    return entry.get("minecraft_party", {}).get("Gespielte Minispiele")
+
+
+def games_since(store: PlayerStore, player: str, since: Optional[float]) -> Optional[float]:
+    """Minigames played since the given time according to the stats snapshots, None if unknown"""
+    history = store.history(player)
+    if since is None or not history:
+        return None
+
+    before = [snapshot for snapshot in history if snapshot["fetched"] <= since]
+    if not before:
+        return None
+
+    start = games_played(before[-1]["entry"])
+    end = games_played(history[-1]["entry"])
+    if start is None or end is None:
+        return None
+    return max(end - start, 0)
+
+
+def rescrape_scores(player_names: List[str], store: PlayerStore, directory: str = 'in-new',
+                    top_players: Optional[set] = None, now: Optional[float] = None) -> pd.DataFrame:
+    """Per-player re-scrape signals and their weighted priority, highest first
+
+    Priorities are the weighted mean of the scaled signals that are known
+    for anyone, in [0, 1]. Players without a capture come first. Players
+    known to have played no minigame since their capture get priority 0,
+    their records cannot have changed.
+    """
+    now = time.time() if now is None else now
+    captured = ingest.capture_times(player_names, directory)
+    if top_players is None:
+        top_players = top_record_holders(directory)
+
+    rows = []
+    for player in player_names:
+        since = games_since(store, player, captured[player])
+        rows.append({
+            "player": player,
+            "captured": captured[player] is not None,
+            "games_since_capture": since,
+            "monthly_time": store.monthly_time(player) or 0,
+            "capture_age": (now - captured[player]) / day if captured[player] is not None else np.nan,
+            "top_records": float(player in top_players),
+        })
+    signals = pd.DataFrame(rows).set_index("player")
+
+    # a signal nobody has a value for is left out and the others share its weight,
+    # e.g. games_since_capture without stats snapshots from before the captures
+    available = {signal: weight for signal, weight in weights.items() if signals[signal].notna().any()}
+    missing = sorted(set(weights) - set(available))
+    if missing:
+        print(f"No values for {', '.join(missing)}, prioritising by {', '.join(available)} only")
+
+    priority = pd.Series(0.0, index=signals.index)
+    for signal, weight in available.items():
+        values = signals[signal].astype(float)
+        # unknown deltas count as average, not as zero
+        values = values.fillna(values.mean())
+        scale = values.max()
+        if scale > 0:
+            priority += weight * values / scale
+    if available:
+        priority /= sum(available.values())
+
+    priority[signals["games_since_capture"] == 0] = 0.0
+    priority[~signals["captured"]] = np.inf
+    signals["priority"] = priority
+
+    return signals.sort_values(["priority", "monthly_time"], ascending=False, kind="stable")
+
+
+def plan_rescrape(player_names: List[str], store: PlayerStore, budget: float = 30 * 60,
+                  seconds_per_player: float = seconds_per_player, directory: str = 'in-new',
+                  top_players: Optional[set] = None, now: Optional[float] = None) -> List[str]:
+    """Prioritised player_list for RecordScraper.scrape that fits into budget seconds"""
+    scores = rescrape_scores(player_names, store, directory=directory, top_players=top_players, now=now)
+    candidates = scores[scores["priority"] > 0]
+
+    slots = int(budget // seconds_per_player)
+    plan = list(candidates.index[:slots])
+
+    skipped = len(scores) - len(candidates)
+    print(f"Planned {len(plan)} of {len(player_names)} players for {budget / 60:.0f} min "
+          f"({len(candidates) - len(plan)} over budget, {skipped} unchanged since their capture)")
+    return plan
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prioritise players for re-scraping")
+    parser.add_argument('--budget', type=float, default=30, help="scrape session length in minutes")
+    parser.add_argument('--seconds-per-player', type=float, default=seconds_per_player)
+    args = parser.parse_args()
+
+    with open('player_names.txt', 'r') as f:
+        names = [line.strip() for line in f if line.strip()]
+
+    with open_store() as players:
+        plan = plan_rescrape(names, players, budget=args.budget * 60, seconds_per_player=args.seconds_per_player)
+
+    for player in plan:
+        print(player)
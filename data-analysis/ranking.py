@@ -0,0 +1,106 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import instrument
+import normalize
+
+# Each minigame may yield a total of 100 points per player. Records #1 through #10 are
+# considered (#1: 100, #2: 90, ..., #10: 10). If a minigame has multiple maps, the 100 points
+# are distributed equally. For Sammelwahn and Replika, the sum over all records is considered solely.
+
+top_n = 10
+
+# point games, plus Drachenflucht where surviving longer is the better record
+higher_is_better = set(ingest.point_minigames) | {"Drachenflucht"}
+
+sum_only_minigames = ["Sammelwahn", "Replika"]
+
+
+def map_ranks(records: pd.DataFrame, method: str = 'min') -> pd.Series:
+    """Rank of every record within its (minigame, map) in one grouped operation
+
+    method='min' gives competition ranks (ties share the best rank, the next
+    rank is skipped), method='dense' gives dense ranks.
+    """
+    # flip time games so that a higher key is always the better record
+    key = np.where(records['minigame'].isin(higher_is_better), records['value'], -records['value'])
+    return pd.Series(key, index=records.index).groupby([records['minigame'], records['map']]).rank(
+        method=method, ascending=False)
+
+
+def rank_records(records: pd.DataFrame) -> pd.DataFrame:
+    """Rank every scored (minigame, map), ties share the best rank"""
+    scored = records[~records['minigame'].isin(sum_only_minigames) | (records['map'] == 'Sum')]
+    return scored.assign(rank=map_ranks(scored))
+
+
+@instrument.traced("rank")
+def minigame_scores(records: pd.DataFrame) -> pd.DataFrame:
+    """Player x minigame frame of ranking points"""
+    ranked = rank_records(records)
+    map_counts = ranked.groupby('minigame')['map'].transform('nunique')
+
+    points = np.where(ranked['rank'] <= top_n, (top_n + 1 - ranked['rank']) * 10, 0) / map_counts
+    scores = ranked.assign(points=points).groupby(['player', 'minigame'])['points'].sum().unstack(fill_value=0.0)
+
+    players = sorted(records['player'].unique())
+    return scores.reindex(index=players, fill_value=0.0)
+
+
+def total_scores(scores: pd.DataFrame) -> pd.Series:
+    """Total ranking points per player, best first (ties by name)"""
+    totals = scores.sum(axis=1)
+    # rounded for the order, equal totals made of thirds can differ in the last bit
+    rounded = totals.round(9)
+    order = sorted(totals.index, key=lambda player: (-rounded[player], player))
+    return totals.reindex(order)
+
+
+@instrument.traced()
+def write_scores(scores: pd.DataFrame, path: str = 'TotalRankingScores.json',
+                 minigames_path: str = 'MinigameRankingScores.json'):
+    """Write the totals as the flat {player: points} dict the site reads, and the per-minigame breakdown next to it"""
+    totals = total_scores(scores)
+    minigames = {
+        minigame: {
+            player: round(float(points), 10)
+            for player, points in scores[minigame].sort_values(ascending=False).items()
+            if points > 0
+        }
+        for minigame in sorted(scores.columns)
+    }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({player: round(float(points), 10) for player, points in totals.items()}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    with open(minigames_path, 'w', encoding='utf-8') as f:
+        json.dump(minigames, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Ranking scores exported to {path} and {minigames_path}")
+
+
+def build_ranking(directory: str = 'in-new', path: str = 'TotalRankingScores.json',
+                  minigames_path: str = 'MinigameRankingScores.json') -> pd.DataFrame:
+    """Rebuild the global ranking from the tooltip exports"""
+    records = normalize.normalized_records(ingest.load_records(directory, cache=ingest.ParseCache()))
+
+    start = time.time()
+    scores = minigame_scores(records)
+    print(f"Ranked {len(records)} records in {time.time() - start:.3f}s")
+
+    write_scores(scores, path, minigames_path)
+    return scores
+
+
+if __name__ == "__main__":
+    scores = build_ranking()
+
+    print("\nTop 10:")
+    for player, points in total_scores(scores).head(10).items():
+        print(f"  {player}: {points:.1f}")
+
+    instrument.finish()
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import normalize
+import ranking
+
+store_version = 2
+
+
+class RecordStore:
+    """Read-only columnar store of the normalized records
+
+    Players, minigames and maps are integer codes into sorted name tables and
+    values stay float64 as parsed, so they print as in the captures. The
+    records are sorted by (minigame, map) and within each map best first, so
+    a map is one contiguous slice: top k is a slice, the rank of a value a
+    binary search. A second ordering groups the records by player for
+    per-player lookups. Nothing is wide, a map without records costs nothing.
+    """
+
+    def __init__(self, players: np.ndarray, minigames: np.ndarray, maps: np.ndarray,
+                 player: np.ndarray, minigame: np.ndarray, map_code: np.ndarray, value: np.ndarray):
+        self.players = players
+        self.minigames = minigames
+        self.maps = maps
+
+        # keys ascend with the quality of the record, ties by player code
+        better = np.isin(minigames, list(ranking.higher_is_better))[minigame]
+        key = np.where(better, -value, value).astype(np.float64)
+        order = np.lexsort((player, key, map_code, minigame))
+
+        self.player = player[order].astype(np.int32)
+        self.minigame = minigame[order].astype(np.int16)
+        self.map = map_code[order].astype(np.int32)
+        self.value = value[order].astype(np.float64)
+        self.key = key[order]
+
+        self.group_starts = np.flatnonzero(np.r_[True, (np.diff(self.minigame) != 0) | (np.diff(self.map) != 0)])
+        self.groups = {
+            (int(self.minigame[start]), int(self.map[start])): (int(start), int(end))
+            for start, end in zip(self.group_starts, np.r_[self.group_starts[1:], len(self.player)])
+        }
+
+        self.by_player = np.argsort(self.player, kind='stable').astype(np.int32)
+        self.player_offsets = np.searchsorted(self.player[self.by_player], np.arange(len(players) + 1))
+
+        self.player_codes = {name: code for code, name in enumerate(players)}
+        self.minigame_codes = {name: code for code, name in enumerate(minigames)}
+        self.map_codes = {name: code for code, name in enumerate(maps)}
+
+    # construction
+
+    @classmethod
+    def from_records(cls, records: pd.DataFrame) -> 'RecordStore':
+        """Store of long-format (player, minigame, map, value) records"""
+        players, player = np.unique(records['player'].to_numpy(dtype=str), return_inverse=True)
+        minigames, minigame = np.unique(records['minigame'].to_numpy(dtype=str), return_inverse=True)
+        maps, map_code = np.unique(records['map'].to_numpy(dtype=str), return_inverse=True)
+        return cls(players, minigames, maps, player, minigame, map_code, records['value'].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> 'RecordStore':
+        return cls.from_records(normalize.frames_to_records(frames))
+
+    def save(self, path: str = 'records_store.npz', source: str = ''):
+        """Binary snapshot, loaded again with RecordStore.load; source is the source_key it was built from"""
+        np.savez(path, version=store_version, source=source, players=self.players, minigames=self.minigames,
+                 maps=self.maps, player=self.player, minigame=self.minigame, map=self.map, value=self.value)
+
+    @classmethod
+    def load(cls, path: str = 'records_store.npz') -> 'RecordStore':
+        with np.load(path) as data:
+            if int(data['version']) != store_version:
+                raise ValueError(f"{path} is a version {int(data['version'])} snapshot, expected {store_version}")
+            return cls(data['players'], data['minigames'], data['maps'],
+                       data['player'], data['minigame'], data['map'], data['value'])
+
+    # lookups
+
+    def _group(self, minigame: str, map_name: str) -> Tuple[int, int]:
+        key = (self.minigame_codes.get(minigame), self.map_codes.get(map_name))
+        if key not in self.groups:
+            raise KeyError(f"No records for {minigame} {map_name}")
+        return self.groups[key]
+
+    def _ranks(self, start: int, positions: np.ndarray) -> np.ndarray:
+        # competition rank: 1 + number of strictly better records, as ranking.map_ranks(method='min')
+        end = self.groups[(int(self.minigame[start]), int(self.map[start]))][1]
+        return np.searchsorted(self.key[start:end], self.key[positions], side='left') + 1
+
+    def map_names(self, minigame: str) -> List[str]:
+        code = self.minigame_codes[minigame]
+        return [str(self.maps[map_code]) for minigame_code, map_code in self.groups if minigame_code == code]
+
+    def top(self, minigame: str, map_name: str, k: int = 10) -> pd.DataFrame:
+        """Best k records of a map with their ranks, records tied with the kth included"""
+        start, end = self._group(minigame, map_name)
+        stop = start + min(k, end - start)
+        if stop < end:
+            # extend over ties with the last included record
+            stop = start + int(np.searchsorted(self.key[start:end], self.key[stop - 1], side='right'))
+
+        positions = np.arange(start, stop)
+        return pd.DataFrame({
+            "rank": self._ranks(start, positions),
+            "player": self.players[self.player[positions]],
+            "value": self.value[positions],
+        })
+
+    def rank_of(self, player: str, minigame: str, map_name: str) -> Optional[int]:
+        """Competition rank of a player's record on a map, None without a record"""
+        start, end = self._group(minigame, map_name)
+        code = self.player_codes.get(player)
+        if code is None:
+            return None
+
+        # a player's positions ascend, so their record on the map is found by bisection as well
+        positions = self.by_player[self.player_offsets[code]:self.player_offsets[code + 1]]
+        i = np.searchsorted(positions, start)
+        if i == len(positions) or positions[i] >= end:
+            return None
+        return int(self._ranks(start, positions[i:i + 1])[0])
+
+    def player_records(self, player: str) -> pd.DataFrame:
+        """Every record of a player with its rank and the number of records on the map"""
+        code = self.player_codes.get(player)
+        if code is None:
+            return pd.DataFrame(columns=['minigame', 'map', 'value', 'rank', 'of'])
+
+        rows = []
+        for position in self.by_player[self.player_offsets[code]:self.player_offsets[code + 1]]:
+            group = (int(self.minigame[position]), int(self.map[position]))
+            start, end = self.groups[group]
+            rows.append((self.minigames[group[0]], self.maps[group[1]], float(self.value[position]),
+                         int(np.searchsorted(self.key[start:end], self.key[position], side='left')) + 1, end - start))
+        return pd.DataFrame(rows, columns=['minigame', 'map', 'value', 'rank', 'of'])
+
+    def group_index(self) -> np.ndarray:
+        """Index of every record's (minigame, map) in group_starts, in store order"""
+        index = np.zeros(len(self.player), dtype=np.int32)
+        index[self.group_starts[1:]] = 1
+        return np.cumsum(index)
+
+    def ranks(self) -> np.ndarray:
+        """Competition rank of every record on its map, in store order, without a groupby"""
+        positions = np.arange(len(self.player))
+        new_group = np.zeros(len(self.player), dtype=bool)
+        new_group[self.group_starts] = True
+        new_value = new_group | np.r_[True, np.diff(self.key) != 0]
+
+        group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+        value_start = np.maximum.accumulate(np.where(new_value, positions, 0))
+        return value_start - group_start + 1
+
+    # exports
+
+    def to_records(self, minigame: Optional[str] = None, categorical: bool = True) -> pd.DataFrame:
+        """Long-format records, best first per map
+
+        Names are categoricals by default; plain strings and float64 values
+        give the frame normalize.normalized_records returns, for ranking.
+        """
+        rows = slice(None)
+        if minigame is not None:
+            rows = self.minigame == self.minigame_codes.get(minigame, -1)
+        records = pd.DataFrame({
+            "player": pd.Categorical.from_codes(self.player[rows], categories=self.players),
+            "minigame": pd.Categorical.from_codes(self.minigame[rows], categories=self.minigames),
+            "map": pd.Categorical.from_codes(self.map[rows], categories=self.maps),
+            "value": self.value[rows],
+        })
+        if categorical:
+            return records
+        return records.astype({"player": str, "minigame": str, "map": str, "value": float})
+
+    def frame(self, minigame: str) -> pd.DataFrame:
+        """Wide player x map frame of one minigame, as normalize_frame returns it"""
+        records = self.to_records(minigame, categorical=False)
+        return records.pivot(index='player', columns='map', values='value').rename_axis(index=None, columns=None)
+
+    def __len__(self) -> int:
+        return len(self.player)
+
+
+def source_key(directory: str = 'in-new') -> str:
+    """Hash of what a store is built from: the captures in directory with their size and mtime, and the normalization rules"""
+    digest = hashlib.sha1()
+    for player, capture in ingest.player_files(directory).items():
+        stat = os.stat(capture)
+        digest.update(f"{player}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    digest.update(json.dumps(normalize.normalization_rules, sort_keys=True, default=repr).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def snapshot_source(path: str) -> Optional[str]:
+    """source_key a snapshot was saved with, None for a missing or older snapshot"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if 'version' not in data or int(data['version']) != store_version or 'source' not in data:
+            return None
+        return str(data['source'])
+
+
+def cached_store(path: str = 'records_store.npz', directory: str = 'in-new') -> RecordStore:
+    """The snapshot at path, rebuilt first when a capture in directory was added, removed or changed, or the rules did"""
+    source = source_key(directory)
+    if snapshot_source(path) == source:
+        return RecordStore.load(path)
+
+    store = RecordStore.from_records(normalize.normalized_records(ingest.load_records(directory, cache=ingest.ParseCache())))
+    store.save(path, source)
+    print(f"Record store of {len(store)} records saved to {path}")
+    return store
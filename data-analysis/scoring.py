@@ -0,0 +1,216 @@
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import ranking
+import recordstore
+
+# The global ranking scheme of ranking.py: the top 10 of every map get 100, 90, ..., 10
+# points, split evenly over the minigame's maps, and only the Sum of Sammelwahn and
+# Replika counts. A scheme overrides any of these settings.
+default_scheme = {
+    "top_n": ranking.top_n,
+    "points": "linear",                        # linear (100 down to 100 / top_n), exponential or harmonic (100 / rank)
+    "decay": 0.8,                              # per rank factor of exponential points
+    "split_maps": True,                        # divide a minigame's points by its number of scored maps
+    "sum_only": ranking.sum_only_minigames,    # minigames only scored by their 'Sum' column
+    "minigame_weights": None,                  # {minigame: weight} or "popularity", others weigh 1
+    "min_records": 0,                          # maps with fewer records are not scored
+    "exclude_minigames": [],
+    "exclude_maps": [],                        # [minigame, map] pairs
+}
+
+# the variants that keep coming up, for `python scoring.py` without a schemes file
+example_schemes = {
+    "current": {},
+    "top 20": {"top_n": 20},
+    "top 5": {"top_n": 5},
+    "exponential": {"points": "exponential", "decay": 0.8},
+    "harmonic": {"points": "harmonic"},
+    "popularity weighted": {"minigame_weights": "popularity"},
+    "active maps": {"min_records": 50},
+    "no map split": {"split_maps": False},
+    "all Replika/Sammelwahn maps": {"sum_only": []},
+}
+
+
+def resolve_scheme(name: str, scheme: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = set(scheme) - set(default_scheme)
+    if unknown:
+        raise ValueError(f"Scheme {name}: unknown settings {', '.join(sorted(unknown))}")
+    resolved = dict(default_scheme, **scheme)
+    if resolved["points"] not in ("linear", "exponential", "harmonic"):
+        raise ValueError(f"Scheme {name}: unknown points {resolved['points']}")
+    return resolved
+
+
+def rank_points(ranks: np.ndarray, scheme: Dict[str, Any]) -> np.ndarray:
+    """Points of a record by its rank before splitting and weighting, 0 outside the top_n"""
+    top_n = scheme["top_n"]
+    if scheme["points"] == "linear":
+        points = (top_n + 1 - ranks) * 100.0 / top_n
+    elif scheme["points"] == "exponential":
+        points = 100.0 * scheme["decay"] ** (ranks - 1.0)
+    else:
+        points = 100.0 / ranks
+    return np.where(ranks <= top_n, points, 0.0)
+
+
+class Evaluator:
+    """Scores many ranking schemes over one RecordStore
+
+    Ranks, map groups and the per-player ordering are computed once; every
+    scheme is then a few array operations over the records, and all
+    schemes are summed per player in a single reduceat over the
+    (records x schemes) points matrix.
+    """
+
+    def __init__(self, store: recordstore.RecordStore):
+        self.store = store
+        self.ranks = store.ranks().astype(np.float64)
+        self.group = store.group_index()
+
+        starts = store.group_starts
+        self.group_minigame = store.minigame[starts]
+        self.group_map = store.map[starts]
+        self.group_size = np.diff(np.r_[starts, len(store)])
+
+        minigame_players = pd.Series(store.player).groupby(store.minigame).nunique()
+        self.minigame_players = minigame_players.reindex(range(len(store.minigames)), fill_value=0).to_numpy()
+
+    def _codes(self, names: List[str], codes: Dict[str, int]) -> np.ndarray:
+        return np.array([codes[name] for name in names if name in codes], dtype=np.int64)
+
+    def scored_groups(self, scheme: Dict[str, Any]) -> np.ndarray:
+        """Mask of the (minigame, map) groups a scheme scores"""
+        store = self.store
+        sum_map = store.map_codes.get('Sum', -1)
+
+        sum_only = np.isin(self.group_minigame, self._codes(scheme["sum_only"], store.minigame_codes))
+        scored = ~sum_only | (self.group_map == sum_map)
+        scored &= ~np.isin(self.group_minigame, self._codes(scheme["exclude_minigames"], store.minigame_codes))
+        scored &= self.group_size >= scheme["min_records"]
+
+        for minigame, map_name in scheme["exclude_maps"]:
+            key = (store.minigame_codes.get(minigame), store.map_codes.get(map_name))
+            if key in store.groups:
+                scored[np.searchsorted(store.group_starts, store.groups[key][0])] = False
+        return scored
+
+    def minigame_weights(self, scheme: Dict[str, Any], scored: np.ndarray) -> np.ndarray:
+        weights = np.ones(len(self.store.minigames))
+        if scheme["minigame_weights"] == "popularity":
+            # players with a record per minigame, scaled to a mean weight of 1 over the scored minigames
+            used = np.unique(self.group_minigame[scored])
+            popularity = self.minigame_players.astype(float)
+            weights = popularity / popularity[used].mean() if len(used) else weights
+        elif scheme["minigame_weights"]:
+            for minigame, weight in scheme["minigame_weights"].items():
+                if minigame in self.store.minigame_codes:
+                    weights[self.store.minigame_codes[minigame]] = weight
+        return weights
+
+    def points(self, scheme: Dict[str, Any]) -> np.ndarray:
+        """Points of every record under a resolved scheme, in store order"""
+        scored = self.scored_groups(scheme)
+        map_counts = np.bincount(self.group_minigame[scored], minlength=len(self.store.minigames))
+
+        divisor = map_counts[self.store.minigame] if scheme["split_maps"] else 1.0
+        weights = self.minigame_weights(scheme, scored)[self.store.minigame]
+        points = rank_points(self.ranks, scheme) * weights / np.maximum(divisor, 1)
+        return np.where(scored[self.group], points, 0.0)
+
+    def evaluate(self, schemes: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+        """Player x scheme frame of total points"""
+        resolved = {name: resolve_scheme(name, scheme) for name, scheme in schemes.items()}
+        matrix = np.column_stack([self.points(scheme) for scheme in resolved.values()])
+
+        order = self.store.by_player
+        totals = np.add.reduceat(matrix[order], self.store.player_offsets[:-1], axis=0)
+        return pd.DataFrame(totals, index=self.store.players.astype(str), columns=list(resolved))
+
+
+def positions(totals: pd.DataFrame) -> pd.DataFrame:
+    """Leaderboard position of every player per scheme, best first and ties by name as in ranking.total_scores"""
+    names = totals.index.to_numpy(dtype=str)
+    result = {}
+    for scheme in totals.columns:
+        # rounded so that summation order noise does not reorder tied players
+        order = np.lexsort((names, -totals[scheme].round(9).to_numpy()))
+        places = np.empty(len(order), dtype=np.int64)
+        places[order] = np.arange(1, len(order) + 1)
+        result[scheme] = places
+    return pd.DataFrame(result, index=totals.index)
+
+
+def compare(totals: pd.DataFrame, baseline: Optional[str] = None, top: int = 10) -> pd.DataFrame:
+    """Rank correlation and position changes of every scheme against the baseline scheme
+
+    spearman is the rank correlation of all players' points (ties averaged),
+    the other columns compare the leaderboards.
+    """
+    baseline = baseline or totals.columns[0]
+    spearman = np.corrcoef(totals.rank(ascending=False, method='average').to_numpy().T)
+    spearman = pd.DataFrame(np.atleast_2d(spearman), index=totals.columns, columns=totals.columns)
+
+    places = positions(totals)
+    shift = places.sub(places[baseline], axis=0)
+    base_top = set(places.index[places[baseline] <= top])
+
+    rows = []
+    for scheme in totals.columns:
+        mover = shift[scheme].abs().idxmax()
+        moved = shift.at[mover, scheme] != 0
+        rows.append({
+            "scheme": scheme,
+            "spearman": spearman.at[scheme, baseline],
+            "leader": places.index[places[scheme] == 1][0],
+            f"top{top}_kept": len(base_top & set(places.index[places[scheme] <= top])),
+            "mean_shift": shift[scheme].abs().mean(),
+            f"mean_shift_top{top}": shift.loc[sorted(base_top), scheme].abs().mean(),
+            "max_shift": int(shift[scheme].abs().max()),
+            "biggest_mover": f"{mover} ({places.at[mover, baseline]} -> {places.at[mover, scheme]})" if moved else "",
+        })
+    return pd.DataFrame(rows).set_index("scheme")
+
+
+def position_changes(totals: pd.DataFrame, scheme: str, baseline: Optional[str] = None) -> pd.DataFrame:
+    """Per player position under baseline and scheme, ordered by the scheme's leaderboard"""
+    baseline = baseline or totals.columns[0]
+    places = positions(totals)
+    changes = pd.DataFrame({
+        "points": totals[scheme],
+        "position": places[scheme],
+        baseline: places[baseline],
+        "change": places[baseline] - places[scheme],
+    })
+    return changes.sort_values("position")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare alternative global ranking schemes")
+    parser.add_argument('schemes', nargs='?', help="JSON file of {name: settings}, the first one is the baseline")
+    parser.add_argument('--store', default='records_store.npz')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--changes', help="also list the position changes of this scheme")
+    args = parser.parse_args()
+
+    schemes = example_schemes
+    if args.schemes:
+        with open(args.schemes, 'r', encoding='utf-8') as f:
+            schemes = json.load(f)
+
+    evaluator = Evaluator(recordstore.cached_store(args.store))
+    start = time.perf_counter()
+    totals = evaluator.evaluate(schemes)
+    print(f"Scored {len(schemes)} schemes for {len(totals)} players in {time.perf_counter() - start:.3f}s\n")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 3):
+        print(compare(totals, top=args.top))
+        if args.changes:
+            print()
+            print(position_changes(totals, args.changes).head(30))
@@ -2,11 +2,25 @@ import os
 import json
 import time
 import requests
-import keyboard
-import pyautogui
-from tqdm import trange
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any, Tuple, Optional
+import threading
+from abc import ABC, abstractmethod
+from tqdm import tqdm
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Optional, Callable
+
+import instrument
+
+# ingest (pandas), the player store, update_player_data and the UUID cache are
+# imported where they are used, so driving the game needs none of them
+if TYPE_CHECKING:
+    from store import PlayerStore
+    from uuid_cache import UUIDCache
+
+try:
+    import keyboard
+    import pyautogui
+except ImportError:  # only needed to drive the game, not for FakeDriver runs
+    keyboard = None
+    pyautogui = None
 
 
 class CoordinateManager:
@@ -77,8 +91,13 @@ class UUIDManager:
             return None
     
     @staticmethod
-    def add_uuids_from_names(names_list, output_file: Optional[str] = None, max_workers: int = 10, delay: float = 0.1):
-        """Add UUIDs for a list of usernames"""
+    def add_uuids_from_names(names_list, output_file: Optional[str] = None, max_workers: int = 10, delay: float = 0.1,
+                             cache: Optional['UUIDCache'] = None):
+        """Add UUIDs for a list of usernames
+
+        Names are resolved in batches through the UUIDCache, cached names are
+        not requested again. delay is no longer used.
+        """
         if isinstance(names_list, str):
             with open(names_list, 'r') as f:
                 names = [line.strip() for line in f if line.strip()]
@@ -87,25 +106,23 @@ class UUIDManager:
         
         print(f"Processing {len(names)} usernames...")
         
+        from uuid_cache import UUIDCache
+        
+        cache = cache or UUIDCache(max_workers=max_workers)
+        resolved = cache.uuids_for(names)
+        cache.save()
+        
         name_to_uuid = {}
         failed_names = []
         
-        def fetch_with_delay(username):
-            time.sleep(delay)
-            uuid = UUIDManager.get_uuid_from_username(username)
-            return username, uuid
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_name = {executor.submit(fetch_with_delay, name): name for name in names}
-            
-            for i, future in enumerate(as_completed(future_to_name)):
-                username, uuid = future.result()
-                if uuid:
-                    name_to_uuid[username] = uuid
-                    print(f"Progress: {i+1}/{len(names)} - {username}: {uuid}")
-                else:
-                    failed_names.append(username)
-                    print(f"Progress: {i+1}/{len(names)} - Failed to get UUID for {username}")
+        for i, username in enumerate(names):
+            uuid = resolved.get(username)
+            if uuid:
+                name_to_uuid[username] = uuid
+                print(f"Progress: {i+1}/{len(names)} - {username}: {uuid}")
+            else:
+                failed_names.append(username)
+                print(f"Progress: {i+1}/{len(names)} - Failed to get UUID for {username}")
         
         if output_file:
             with open(output_file, 'w') as f:
@@ -139,25 +156,44 @@ class PlayerManager:
     
     @staticmethod
     def is_player_active(player_data: Dict[str, Any]) -> bool:
-        """Check if player is active based on mp monthly time > 100"""
+        """Check if player is active based on mp monthly time > store.active_threshold"""
+        from store import active_threshold
+        
         if not player_data:
             return False
         
         try:
             mp_monthly_time = player_data['stats']['mp']['monthly']['time']
-            return mp_monthly_time > 100
+            return mp_monthly_time > active_threshold
         except (KeyError, TypeError):
             print(f"Missing MP data for player, considering inactive")
             return False
     
     @staticmethod
-    def filter_active_players(player_list: List[str]) -> List[str]:
-        """Filter playerList to keep only active players"""
+    def filter_active_players(player_list: List[str], store: Optional['PlayerStore'] = None,
+                              max_age: float = 24 * 60 * 60) -> List[str]:
+        """Filter playerList to keep only active players
+
+        With a PlayerStore, players whose stats were fetched within max_age
+        seconds (e.g. by update_player_data.py) are decided from the store;
+        only the others are fetched from the API, and recorded in the store.
+        """
+        from update_player_data import build_player_entry, monthly_playtime
+        
         active_players = []
         
         for player in player_list:
             print(f"Checking player: {player}")
-            player_data = PlayerManager.fetch_player_data(player)
+            
+            age = store.stats_age(player) if store is not None else None
+            if age is not None and age < max_age:
+                mp_time = store.monthly_time(player)
+                player_data = {'stats': {'mp': {'monthly': {'time': mp_time}}}}
+            else:
+                player_data = PlayerManager.fetch_player_data(player)
+                if store is not None and player_data:
+                    store.record_stats([build_player_entry(player, player_data)],
+                                       {player: monthly_playtime(player_data)})
             
             if PlayerManager.is_player_active(player_data):
                 active_players.append(player)
@@ -196,13 +232,273 @@ class PlayerManager:
         return player_list
 
 
+class ScrapeDriver(ABC):
+    """GUI actions of a scrape, so the scrape loop can run against a fake game"""
+    
+    @abstractmethod
+    def open_records(self, player: str):
+        """Open the /rekorde inventory of player"""
+    
+    @abstractmethod
+    def hover(self, x: int, y: int, duration: float):
+        """Move the mouse onto an inventory slot"""
+    
+    @abstractmethod
+    def close_records(self):
+        """Close the inventory, which writes out ItemTooltipExport.txt"""
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class PyAutoGUIDriver(ScrapeDriver):
+    """Drives the Minecraft client with pyautogui and keyboard"""
+    
+    def open_records(self, player: str):
+        pyautogui.press("t")
+        pyautogui.sleep(0.2)
+        
+        command = f"/rekorde {player}"
+        pyautogui.sleep(0.2)
+        keyboard.write(command)
+        pyautogui.sleep(0.2)
+        pyautogui.press("enter")
+        pyautogui.sleep(0.15)
+        
+        pyautogui.moveTo(x=500, y=500, duration=0.002)
+    
+    def hover(self, x: int, y: int, duration: float):
+        pyautogui.moveTo(x=x, y=y, duration=duration)
+    
+    def close_records(self):
+        pyautogui.press("e")
+        pyautogui.sleep(0.2)
+    
+    def sleep(self, seconds: float):
+        pyautogui.sleep(seconds)
+
+
+class FakeDriver(ScrapeDriver):
+    """Headless stand-in for the game
+
+    Appends the next tooltip line of the open player to ItemTooltipExport.txt
+    latency seconds after each hover (open_latency after opening the
+    inventory), like the tooltip export mod does.
+    """
+    
+    def __init__(self, desktop_path: str, tooltips: Dict[str, List[str]], latency: float = 0.02,
+                 open_latency: float = 0.3):
+        self.export_path = os.path.join(desktop_path, "ItemTooltipExport.txt")
+        self.tooltips = tooltips
+        self.latency = latency
+        self.open_latency = open_latency
+        self.lines = []
+        self.slot = 0
+        self.ready_at = 0.0
+        self._lock = threading.Lock()
+    
+    def open_records(self, player: str):
+        self.lines = self.tooltips.get(player, [])
+        self.slot = 0
+        self.ready_at = time.time() + self.open_latency
+    
+    def hover(self, x: int, y: int, duration: float):
+        time.sleep(duration)
+        if self.slot < len(self.lines):
+            line = self.lines[self.slot]
+            delay = max(self.ready_at - time.time(), 0) + self.latency
+            threading.Timer(delay, self._write, args=(line,)).start()
+        self.slot += 1
+    
+    def close_records(self):
+        pass
+    
+    def _write(self, line: str):
+        with self._lock:
+            with open(self.export_path, 'a', encoding='utf-8') as f:
+                f.write(f"TooltipEvent, {line}\n")
+
+
+class AdaptiveTimeout:
+    """Wait budget that follows the observed tooltip latency
+
+    Keeps a moving average of how long tooltip lines took to land and allows
+    factor times that, within [minimum, maximum]. Until something has been
+    observed the initial budget applies.
+    """
+    
+    def __init__(self, initial: float, factor: float = 3.0, minimum: float = 0.05, maximum: float = 2.0,
+                 smoothing: float = 0.2):
+        self.initial = initial
+        self.factor = factor
+        self.minimum = minimum
+        self.maximum = maximum
+        self.smoothing = smoothing
+        self.mean = None
+    
+    def observe(self, latency: float):
+        if self.mean is None:
+            self.mean = latency
+        else:
+            self.mean += self.smoothing * (latency - self.mean)
+    
+    @property
+    def value(self) -> float:
+        if self.mean is None:
+            return self.initial
+        return min(max(self.mean * self.factor, self.minimum), self.maximum)
+
+
+class TooltipWatcher:
+    """Polls ItemTooltipExport.txt for new lines"""
+    
+    def __init__(self, path: str, poll: float = 0.005):
+        self.path = path
+        self.poll = poll
+        self._size = -1
+        self._lines = 0
+    
+    def line_count(self) -> int:
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            self._size, self._lines = -1, 0
+            return 0
+        
+        # only re-read the file when it grew
+        if size != self._size:
+            with open(self.path, 'rb') as f:
+                self._lines = f.read().count(b'\n')
+            self._size = size
+        return self._lines
+    
+    def wait_for_growth(self, lines: int, timeout: float) -> Optional[float]:
+        """Seconds until the file has more than lines lines, None on timeout"""
+        start = time.time()
+        while True:
+            if self.line_count() > lines:
+                return time.time() - start
+            if time.time() - start >= timeout:
+                return None
+            time.sleep(self.poll)
+
+
+def previous_line_counts(player_list: List[str], reference_dir: str = 'in-new') -> Dict[str, int]:
+    """Tooltip lines of every player's previous capture, players without one left out
+
+    A line is a minigame the player has records in, and records don't
+    disappear, so a new capture should have at least as many.
+    """
+    counts = {}
+    for player in player_list:
+        path = os.path.join(reference_dir, f"{player}.txt")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                counts[player] = sum(1 for line in f if line.strip())
+    return counts
+
+
+def validate_capture(path: str, reference: Optional[str] = None, min_lines: int = 14) -> Optional[str]:
+    """Check a record capture, returning why it is broken or None if it looks complete
+
+    Every line has to be a known minigame line. With a reference (the
+    player's previous capture) no minigame of it may be missing, since
+    records don't disappear; without one, or when the reference has no
+    minigame lines itself (an empty or broken earlier capture), at least
+    min_lines minigames are expected.
+    """
+    import ingest
+
+    text = ingest.read_file(path) if os.path.exists(path) else None
+    if text is None:
+        return "no capture file"
+
+    parsed = ingest.parse_text(text)
+    if not parsed:
+        return "no minigame lines"
+
+    unknown = [line for line in text.split('\n') if line.strip() and not any(minigame in line for minigame in ingest.minigames)]
+    if unknown:
+        return f"{len(unknown)} unrecognized lines"
+
+    previous = ingest.parse_file(reference) if reference is not None else {}
+    if previous:
+        missing = sorted(set(previous) - set(parsed))
+        if missing:
+            return f"missing {', '.join(missing)}"
+    elif len(parsed) < min_lines:
+        return f"only {len(parsed)} minigame lines"
+
+    return None
+
+
+class ScrapeQueue:
+    """Persistent per-player capture state of a scrape run
+
+    Each job is pending, captured (file renamed), validated or failed, with
+    its attempt count and last error. The file is rewritten atomically after
+    every change, so a crash loses at most the capture in flight.
+    """
+    
+    states = ('pending', 'captured', 'validated', 'failed')
+    
+    def __init__(self, path: str = 'scrape_jobs.json'):
+        self.path = path
+        self.jobs = {}
+        
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.jobs = json.load(f)
+    
+    def add(self, player_list: List[str]):
+        """Queue players that are not queued yet"""
+        for player in player_list:
+            self.jobs.setdefault(player, {"state": "pending", "attempts": 0, "error": None, "updated": time.time()})
+        self.save()
+    
+    def start(self, player: str):
+        """Count a capture attempt"""
+        self.jobs[player]["attempts"] += 1
+        self.save()
+    
+    def mark(self, player: str, state: str, error: Optional[str] = None):
+        if state not in self.states:
+            raise ValueError(f"Unknown job state {state}")
+        self.jobs[player].update(state=state, error=error, updated=time.time())
+        self.save()
+    
+    def players(self, state: str) -> List[str]:
+        return [player for player, job in self.jobs.items() if job["state"] == state]
+    
+    def retryable(self, max_attempts: int = 3) -> List[str]:
+        """Failed jobs that have attempts left"""
+        return [player for player in self.players('failed') if self.jobs[player]["attempts"] < max_attempts]
+    
+    def counts(self) -> Dict[str, int]:
+        return {state: len(self.players(state)) for state in self.states}
+    
+    def summary(self) -> str:
+        counts = self.counts()
+        line = ", ".join(f"{counts[state]} {state}" for state in self.states)
+        failed = [f"{player} ({self.jobs[player]['error']})" for player in self.players('failed')]
+        return line + (f"\nFailed: {', '.join(failed)}" if failed else "")
+    
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+
 class RecordScraper:
     """Main scraping functionality"""
     
-    def __init__(self):
+    def __init__(self, driver: Optional[ScrapeDriver] = None, desktop_path: Optional[str] = None):
         self.coord_manager = CoordinateManager()
-        self.desktop_path = os.path.expanduser("~/Desktop")
+        self.desktop_path = desktop_path or os.path.expanduser("~/Desktop")
+        self.driver = driver or PyAutoGUIDriver()
     
+    @instrument.traced()
     def scrape(self, player_list: List[str], resolution: str = "2k", fast: bool = False, 
                extended: bool = False, dur: Optional[float] = None):
         """Scrape records for each player in playerList"""
@@ -216,34 +512,127 @@ class RecordScraper:
         
         sleep_time = duration if fast or dur is not None else 0.05
         
-        for i, player in enumerate(player_list):
-            if sorted(player_list) == sorted(desktop_files):
-                print("All records have been scraped.")
-                break
+        if sorted(player_list) == sorted(desktop_files):
+            print("All records have been scraped.")
+            return
+        
+        for player in tqdm(player_list, desc="Processing players", position=0):
+            self.driver.open_records(player)
             
-            with trange(len(player_list), desc="Processing players", position=0) as t:
-                t.update(i)
-                
-                pyautogui.press("t")
-                pyautogui.sleep(0.2)
-                
-                command = f"/rekorde {player}"
-                pyautogui.sleep(0.2)
-                keyboard.write(command)
-                pyautogui.sleep(0.2)
-                pyautogui.press("enter")
-                pyautogui.sleep(0.15)
-                
-                pyautogui.moveTo(x=500, y=500, duration=0.002)
-                
-                for coord in coords:
-                    pyautogui.moveTo(x=coord[0], y=coord[1], duration=duration)
-                    pyautogui.sleep(sleep_time)
+            for coord in coords:
+                self.driver.hover(coord[0], coord[1], duration)
+                self.driver.sleep(sleep_time)
+            
+            self.driver.close_records()
+            
+            self._rename_file(player)
+    
+    @instrument.traced()
+    def scrape_events(self, player_list: List[str], resolution: str = "2k", fast: bool = True,
+                      extended: bool = False, expected_lines: Optional[Dict[str, int]] = None,
+                      max_lines: int = 24, hover_duration: float = 0.002, open_timeout: float = 2.0,
+                      on_captured: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+        """Scrape records, advancing as soon as each tooltip line lands
+
+        Instead of fixed hover and sleep times, every slot is left once
+        ItemTooltipExport.txt grew by a line, or after a timeout that adapts
+        to the latency observed so far (empty slots). A player is done after
+        the last slot, or once max_lines lines (every minigame) arrived.
+        Captures with fewer lines than expected_lines[player], usually the
+        previous capture's count, are reported right away, and
+        on_captured(player, lines) is called after every player. Returns the
+        captured line count per player.
+        """
+        coords = self.coord_manager.get_coordinates(resolution, fast, extended)
+        export_path = os.path.join(self.desktop_path, "ItemTooltipExport.txt")
+        expected_lines = expected_lines or {}
+        watcher = TooltipWatcher(export_path)
+        
+        # the first line after opening the inventory takes longer than the ones after it
+        first_timeout = AdaptiveTimeout(open_timeout, maximum=open_timeout)
+        slot_timeout = AdaptiveTimeout(0.5)
+        
+        captured = {}
+        for player in tqdm(player_list, desc="Processing players", position=0):
+            if os.path.exists(export_path):
+                os.remove(export_path)  # leftover of an aborted capture
+            
+            self.driver.open_records(player)
+            
+            lines = 0
+            for i, coord in enumerate(coords):
+                self.driver.hover(coord[0], coord[1], hover_duration)
                 
-                pyautogui.press("e")
-                pyautogui.sleep(0.2)
+                timeout = first_timeout if lines == 0 else slot_timeout
+                latency = watcher.wait_for_growth(lines, timeout.value)
+                if latency is not None:
+                    timeout.observe(latency)
+                lines = watcher.line_count()
                 
+                if lines >= max_lines:
+                    break
+            
+            self.driver.close_records()
+            captured[player] = lines
+            
+            if lines == 0:
+                print(f"No tooltip lines captured for {player}.")
+            else:
+                if lines < expected_lines.get(player, 0):
+                    print(f"{player} has {lines} lines, {expected_lines[player]} last time.")
                 self._rename_file(player)
+            
+            if on_captured is not None:
+                on_captured(player, lines)
+        
+        return captured
+    
+    def run_queue(self, queue: 'ScrapeQueue', reference_dir: str = 'in-new', retries: int = 2,
+                  min_lines: int = 14, **scrape_kwargs) -> Dict[str, int]:
+        """Scrape every unfinished job of queue, validating each capture as it lands
+
+        Jobs left 'captured' by a crash are validated first, then the pending
+        ones are scraped with scrape_events, expecting at least the line count
+        of each player's capture in reference_dir. Failed captures are deleted and
+        re-run in at most retries extra passes. Every state change is saved,
+        so an interrupted run picks up where it stopped.
+        """
+        def validate(player: str, lines: int):
+            if lines:
+                queue.mark(player, 'captured')
+            path = os.path.join(self.desktop_path, f"{player}.txt")
+            reference = os.path.join(reference_dir, f"{player}.txt")
+            error = validate_capture(path, reference if os.path.exists(reference) else None, min_lines=min_lines)
+            
+            if error is None:
+                queue.mark(player, 'validated')
+                return
+            queue.mark(player, 'failed', error=error)
+            print(f"Capture of {player} failed: {error}")
+            if os.path.exists(path):
+                os.remove(path)  # the retry renames a new capture to the same name
+        
+        for player in queue.players('captured'):
+            validate(player, 1)
+        
+        for attempt in range(retries + 1):
+            if attempt:
+                retry = queue.retryable(max_attempts=retries + 1)
+                if not retry:
+                    break
+                print(f"Retry pass {attempt}: {len(retry)} failed captures")
+                for player in retry:
+                    queue.mark(player, 'pending')
+            
+            pending = queue.players('pending')
+            if pending:
+                for player in pending:
+                    queue.start(player)
+                expected = scrape_kwargs.get('expected_lines') or previous_line_counts(pending, reference_dir)
+                self.scrape_events(pending, on_captured=validate, **dict(scrape_kwargs, expected_lines=expected))
+        
+        print(queue.summary())
+        return queue.counts()
     
     def _rename_file(self, player: str):
         """Rename the exported file to player name"""
@@ -256,9 +645,10 @@ class RecordScraper:
         except Exception:
             print(f"Error renaming file for {player}.")
     
-    def verify_desktop(self, player_list: List[str], debug: bool = False):
-        """Verify line count for each scraped file"""
+    def verify_desktop(self, player_list: List[str], debug: bool = False, reference_dir: str = 'in-new'):
+        """Verify line count for each scraped file against the player's previous capture"""
         error_count = 0
+        expected_lines = previous_line_counts(player_list, reference_dir)
         
         for player in player_list:
             try:
@@ -267,8 +657,8 @@ class RecordScraper:
                     lines = file.readlines()
                     if debug:
                         print(f"{player} has {len(lines)} lines.")
-                    elif len(lines) != 24:
-                        print(f"{player} has {len(lines)} lines.")
+                    elif len(lines) < expected_lines.get(player, 1):
+                        print(f"{player} has {len(lines)} lines, {expected_lines.get(player, 1)} expected.")
                         error_count += 1
             except FileNotFoundError:
                 print(f"{player} has no file.")
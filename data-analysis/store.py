@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+
+schema = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY COLLATE NOCASE,
+    uuid TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_uuid ON players (uuid);
+
+CREATE TABLE IF NOT EXISTS stats (
+    player TEXT PRIMARY KEY COLLATE NOCASE,
+    fetched REAL NOT NULL,
+    rank TEXT,
+    monthly_time INTEGER NOT NULL DEFAULT 0,
+    hash TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    changed REAL
+);
+CREATE INDEX IF NOT EXISTS stats_monthly_time ON stats (monthly_time);
+CREATE INDEX IF NOT EXISTS stats_rank ON stats (rank);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    player TEXT NOT NULL COLLATE NOCASE,
+    fetched REAL NOT NULL,
+    monthly_time INTEGER NOT NULL DEFAULT 0,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (player, fetched)
+);
+"""
+
+# monthly MP time above which a player counts as active, for the scraper's activity filter and the refresh tiers
+active_threshold = 100
+
+# the store as JSON, committed by the workflow so that machines without players.db get the fetched stats
+sync_file = 'player_store.json'
+sync_version = 1
+
+day = 24 * 60 * 60
+
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class PlayerStore:
+    """Local SQLite store of players, UUIDs and player_data.json stat snapshots
+
+    Shared by the scraper, update_player_data.py and the analysis so that
+    activity checks and name lists are indexed queries instead of API calls
+    or full JSON loads. stats holds the latest entry per player with when it
+    was fetched and last changed, snapshots one row per change. The JSON
+    files of the static site are exported from it, and export_sync /
+    import_sync carry it to machines without the database.
+    """
+
+    def __init__(self, path: str = 'players.db'):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(schema)
+
+        if "changed" not in {column for _, column, *_ in self.db.execute("PRAGMA table_info(stats)")}:
+            # stores from before the refresh bookkeeping moved in here
+            with self.db:
+                self.db.execute("ALTER TABLE stats ADD COLUMN changed REAL")
+                self.db.execute("UPDATE stats SET changed = fetched")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # players and UUIDs
+
+    def add_players(self, uuids: Dict[str, Optional[str]], now: Optional[float] = None):
+        """Insert or update players, a None UUID keeps a known one"""
+        now = time.time() if now is None else now
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO players (name, uuid, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET uuid = COALESCE(excluded.uuid, uuid), last_seen = excluded.last_seen",
+                [(name, uuid, now, now) for name, uuid in uuids.items()])
+
+    def rename_player(self, old_name: str, new_name: str):
+        """Carry a player's rows over to a new name"""
+        with self.db:
+            if self.db.execute("SELECT 1 FROM players WHERE name = ?", (new_name,)).fetchone():
+                self.db.execute("DELETE FROM players WHERE name = ?", (old_name,))
+            else:
+                self.db.execute("UPDATE players SET name = ? WHERE name = ?", (new_name, old_name))
+            self.db.execute("UPDATE OR REPLACE stats SET player = ? WHERE player = ?", (new_name, old_name))
+            self.db.execute("UPDATE OR REPLACE snapshots SET player = ? WHERE player = ?", (new_name, old_name))
+
+    def uuid_of(self, name: str) -> Optional[str]:
+        row = self.db.execute("SELECT uuid FROM players WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def player_names(self) -> List[str]:
+        """All known player names, sorted"""
+        return [name for name, in self.db.execute("SELECT name FROM players ORDER BY name")]
+
+    def player_uuids(self) -> Dict[str, str]:
+        """Name -> UUID of every player with a known UUID"""
+        return dict(self.db.execute("SELECT name, uuid FROM players WHERE uuid IS NOT NULL ORDER BY rowid"))
+
+    def missing_uuids(self, names: Iterable[str]) -> List[str]:
+        """Names of the given players without a stored UUID"""
+        known = set(name.lower() for name in self.player_uuids())
+        return [name for name in names if name.lower() not in known]
+
+    # stats
+
+    def record_stats(self, entries: Iterable[Dict[str, Any]], monthly_time: Dict[str, int],
+                     now: Optional[float] = None) -> int:
+        """Store fetched player_data.json entries, returning how many changed
+
+        Players missing from monthly_time keep their stored monthly time. A
+        snapshot is only appended, and the player's changed time set, when an
+        entry differs from the stored one.
+        """
+        now = time.time() if now is None else now
+        changed = 0
+        with self.db:
+            for entry in entries:
+                name = entry["name"]
+                digest = entry_hash(entry)
+                row = self.db.execute("SELECT hash, monthly_time, changed FROM stats WHERE player = ?", (name,)).fetchone()
+                payload = json.dumps(entry, ensure_ascii=False)
+                minutes = monthly_time.get(name, row[1] if row else 0)
+                is_new = row is None or row[0] != digest
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO stats (player, fetched, rank, monthly_time, hash, entry, changed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, now, entry.get("rank"), minutes, digest, payload, now if is_new else row[2]))
+                if is_new:
+                    self.db.execute("INSERT OR REPLACE INTO snapshots (player, fetched, monthly_time, entry) VALUES (?, ?, ?, ?)",
+                                    (name, now, minutes, payload))
+                    changed += 1
+        return changed
+
+    def latest_stats(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT entry FROM stats WHERE player = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def monthly_time(self, name: str) -> Optional[int]:
+        row = self.db.execute("SELECT monthly_time FROM stats WHERE player = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def stats_age(self, name: str, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the player's stats were last fetched, None if never"""
+        row = self.db.execute("SELECT fetched FROM stats WHERE player = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return (time.time() if now is None else now) - row[0]
+
+    def refresh_state(self) -> Dict[str, Dict[str, Any]]:
+        """When each player was last fetched and last changed, and their monthly MP time"""
+        return {player: {"fetched": fetched, "changed": changed or 0, "monthly_time": minutes}
+                for player, fetched, changed, minutes in self.db.execute(
+                    "SELECT player, fetched, changed, monthly_time FROM stats")}
+
+    def active_players(self, threshold: int = active_threshold) -> List[str]:
+        """Players whose last fetched monthly MP time is above threshold, most active first"""
+        return [name for name, in self.db.execute(
+            "SELECT player FROM stats WHERE monthly_time > ? ORDER BY monthly_time DESC, player", (threshold,))]
+
+    def history(self, name: str) -> List[Dict[str, Any]]:
+        """Every stored snapshot of a player, oldest first"""
+        return [{"fetched": fetched, "monthly_time": minutes, "entry": json.loads(entry)}
+                for fetched, minutes, entry in self.db.execute(
+                    "SELECT fetched, monthly_time, entry FROM snapshots WHERE player = ? ORDER BY fetched", (name,))]
+
+    # exports for the static site
+
+    def export_player_uuids(self, path: str = 'player_uuids.json'):
+        with open(path, 'w') as f:
+            json.dump(self.player_uuids(), f, indent=2)
+        print(f"Player UUIDs exported to {path}")
+
+    def export_player_names(self, path: str = 'player_names.txt'):
+        with open(path, 'w') as f:
+            for name in self.player_names():
+                f.write(f"{name}\n")
+        print(f"Player name list saved to: {path}")
+
+    def export_player_data(self, path: str = 'player_data.json', names: Optional[List[str]] = None):
+        """Write player_data.json from the latest stats, in the order of names
+
+        Players without stored stats get the same "Error" entry the updater
+        writes for failed fetches.
+        """
+        entries = {name: json.loads(entry) for name, entry in self.db.execute("SELECT player, entry FROM stats")}
+        if names is not None:
+            entries = {name: entries.get(name, {"name": name, "rank": "Error", "minecraft_party": {}}) for name in names}
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=4)
+        print(f"Data exported to {path}")
+
+    # sync between machines
+
+    def export_sync(self, path: str = sync_file, keep_days: float = 60, now: Optional[float] = None):
+        """Write the store as JSON, read back with import_sync
+
+        Holds every player, their latest stats and the snapshots of the last
+        keep_days plus the one before those, which covers what the activity
+        filter and the re-scrape planner look at.
+        """
+        now = time.time() if now is None else now
+        cutoff = now - keep_days * day
+
+        snapshots = {}
+        for player, fetched, minutes, entry in self.db.execute(
+                "SELECT player, fetched, monthly_time, entry FROM snapshots AS s WHERE fetched >= ? OR fetched = "
+                "(SELECT MAX(fetched) FROM snapshots WHERE player = s.player AND fetched < ?) ORDER BY player, fetched",
+                (cutoff, cutoff)):
+            snapshots.setdefault(player, []).append([fetched, minutes, json.loads(entry)])
+
+        data = {
+            "version": sync_version,
+            "players": {name: [uuid, first_seen, last_seen] for name, uuid, first_seen, last_seen in self.db.execute(
+                "SELECT name, uuid, first_seen, last_seen FROM players")},
+            "stats": {player: {"fetched": fetched, "changed": changed, "monthly_time": minutes, "entry": json.loads(entry)}
+                      for player, fetched, changed, minutes, entry in self.db.execute(
+                          "SELECT player, fetched, changed, monthly_time, entry FROM stats")},
+            "snapshots": snapshots,
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+        print(f"Player store exported to {path}")
+
+    def import_sync(self, path: str = sync_file) -> int:
+        """Merge an export_sync file into the store, returning how many players got newer stats
+
+        Stats are only taken over when they were fetched later than the
+        stored ones, snapshots already in the store are kept.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != sync_version:
+            print(f"Ignoring {path}: version {data.get('version')}, expected {sync_version}")
+            return 0
+
+        updated = 0
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO players (name, uuid, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET uuid = COALESCE(excluded.uuid, uuid), "
+                "first_seen = MIN(first_seen, excluded.first_seen), last_seen = MAX(last_seen, excluded.last_seen)",
+                [(name, uuid, first_seen, last_seen) for name, (uuid, first_seen, last_seen) in data["players"].items()])
+
+            for player, stats in data["stats"].items():
+                row = self.db.execute("SELECT fetched FROM stats WHERE player = ?", (player,)).fetchone()
+                if row is not None and row[0] >= stats["fetched"]:
+                    continue
+                entry = stats["entry"]
+                self.db.execute(
+                    "INSERT OR REPLACE INTO stats (player, fetched, rank, monthly_time, hash, entry, changed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (player, stats["fetched"], entry.get("rank"), stats["monthly_time"], entry_hash(entry),
+                     json.dumps(entry, ensure_ascii=False), stats["changed"]))
+                updated += 1
+
+            self.db.executemany(
+                "INSERT OR IGNORE INTO snapshots (player, fetched, monthly_time, entry) VALUES (?, ?, ?, ?)",
+                [(player, fetched, minutes, json.dumps(entry, ensure_ascii=False))
+                 for player, rows in data["snapshots"].items() for fetched, minutes, entry in rows])
+        return updated
+
+    def import_json(self, uuids_file: str = 'player_uuids.json', data_file: str = 'player_data.json',
+                    now: Optional[float] = None):
+        """Seed the store from the existing JSON files"""
+        with open(uuids_file, 'r') as f:
+            self.add_players(json.load(f), now=now)
+
+        with open(data_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        self.add_players({name: None for name in entries}, now=now)
+        self.record_stats([entry for entry in entries.values() if entry.get("rank") != "Error"], {}, now=now)
+
+
+def open_store(path: str = 'players.db', sync_path: Optional[str] = sync_file) -> PlayerStore:
+    """The local store, first brought up to date with the committed sync file if there is one"""
+    store = PlayerStore(path)
+    if sync_path and os.path.exists(sync_path):
+        updated = store.import_sync(sync_path)
+        print(f"Player store synced from {sync_path}, {updated} players with newer stats")
+    return store
@@ -0,0 +1,150 @@
+import os
+import re
+import random
+import argparse
+from typing import Any, Dict, List, Optional
+
+import ingest
+
+
+# one "Map :  value" segment of a tooltip line, as the export mod writes them
+time_segment = re.compile(r'\s*(.*?) :  (?:(\d+) min  )?(?:(\d+) s  )?(\d+) ms')
+point_segment = re.compile(r'\s*(.*?) :  (\d+)  (\w+)')
+
+
+def split_segments(rest: str, minigame: str) -> List[tuple]:
+    """(map, value, unit) segments of a tooltip line without its minigame prefix
+
+    Times come back in seconds with unit 's'.
+    """
+    segments = []
+    pattern = time_segment if minigame in ingest.time_minigames else point_segment
+    position = 0
+
+    while True:
+        match = pattern.match(rest, position)
+        if match is None:
+            break
+        if minigame in ingest.time_minigames:
+            map_name, minutes, seconds, millis = match.groups()
+            segments.append((map_name, int(minutes or 0) * 60 + int(seconds or 0) + int(millis) / 1000, 's'))
+        else:
+            map_name, points, unit = match.groups()
+            segments.append((map_name, int(points), unit))
+        position = match.end()
+
+    return segments
+
+
+def build_catalog(directory: str = 'in-new') -> Dict[str, Any]:
+    """Maps, units, value samples and frequencies of every minigame in real captures
+
+    The synthetic players are drawn from this, so they share the real map
+    names, line order and unit spellings (Kill/Kills, Punkte, Runden).
+    """
+    files = ingest.player_files(directory)
+    line_order = {}
+    minigames = {}
+    players = 0
+
+    for path in files.values():
+        text = ingest.read_file(path)
+        if not text or not text.strip():
+            continue
+        players += 1
+
+        for line in text.split('\n'):
+            line = line.replace('TooltipEvent, ', '')
+            minigame = next((minigame for minigame in ingest.minigames if line.startswith(minigame)), None)
+            if minigame is None:
+                continue
+            line_order.setdefault(minigame, len(line_order))
+
+            entry = minigames.setdefault(minigame, {"lines": 0, "maps": {}})
+            entry["lines"] += 1
+            for map_name, value, unit in split_segments(line[len(minigame):], minigame):
+                stats = entry["maps"].setdefault(map_name, {"count": 0, "values": [], "units": []})
+                stats["count"] += 1
+                stats["values"].append(value)
+                stats["units"].append(unit)
+
+    return {
+        "players": players,
+        "order": sorted(line_order, key=line_order.get),
+        "minigames": minigames,
+    }
+
+
+def format_time(seconds: float) -> str:
+    """'1 min  07 s  090 ms' style time of the export mod"""
+    millis = int(round(seconds * 1000))
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    if minutes:
+        return f"{minutes} min  {secs:02d} s  {millis:03d} ms"
+    return f"{secs} s  {millis:03d} ms"
+
+
+def format_points(points: int, unit: str) -> str:
+    if unit in ("Kill", "Kills"):
+        unit = "Kill" if points == 1 else "Kills"
+    return f"{points}  {unit}"
+
+
+def generate_lines(catalog: Dict[str, Any], rng: random.Random, spread: float = 0.1) -> List[str]:
+    """Tooltip lines of one synthetic player
+
+    Each minigame line and map appears with its real frequency; values are
+    real samples with up to spread relative jitter.
+    """
+    lines = []
+
+    for minigame in catalog["order"]:
+        entry = catalog["minigames"][minigame]
+        if rng.random() >= entry["lines"] / catalog["players"]:
+            continue
+
+        segments = []
+        for map_name, stats in entry["maps"].items():
+            if rng.random() >= stats["count"] / entry["lines"]:
+                continue
+            value = rng.choice(stats["values"]) * (1 + rng.uniform(-spread, spread))
+            unit = rng.choice(stats["units"])
+
+            if minigame in ingest.time_minigames:
+                segments.append(f"{map_name} :  {format_time(max(value, 0.001))}")
+            else:
+                segments.append(f"{map_name} :  {format_points(max(int(round(value)), 0), unit)}")
+
+        if segments:
+            lines.append(f"TooltipEvent, {minigame} " + " ".join(segments))
+
+    return lines
+
+
+def generate_players(directory: str, count: int, seed: int = 0, template_dir: str = 'in-new',
+                     catalog: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Write count synthetic player captures to directory, returning their names"""
+    catalog = catalog or build_catalog(template_dir)
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    names = []
+    for i in range(count):
+        name = f"synth{i:06d}"
+        with open(os.path.join(directory, f"{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(generate_lines(catalog, rng)) + "\n")
+        names.append(name)
+
+    print(f"Generated {count} synthetic players in {directory}")
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic tooltip captures")
+    parser.add_argument('directory')
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_players(args.directory, args.players, seed=args.seed)
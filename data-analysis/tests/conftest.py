@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the analysis modules are flat scripts in data-analysis/, run as `python -m pytest tests` from there
+analysis_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, analysis_dir)
+
+import export  # noqa: E402
+import ingest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def frames():
+    """Normalized frames of the real captures in in-new/, parsed without touching the parse cache"""
+    return export.minigame_frames(ingest.load_records(os.path.join(analysis_dir, 'in-new'), serial=True))
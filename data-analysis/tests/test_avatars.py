@@ -0,0 +1,82 @@
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import avatars
+
+
+def face_png(color):
+    payload = io.BytesIO()
+    Image.new('RGBA', (32, 32), color).save(payload, format='PNG')
+    return payload.getvalue()
+
+
+class FaceStub(BaseHTTPRequestHandler):
+    """Face endpoint answering from server.faces, keyed by the dashed UUID in the path"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.calls.append(self.path)
+        uuid = self.path.split('?')[0].rsplit('/', 1)[-1]
+        status, headers, payload = 404, {}, b''
+        if self.server.failures:
+            status, headers = self.server.failures.pop(0)
+        elif uuid in self.server.faces:
+            status, payload = 200, self.server.faces[uuid]
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def faces():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FaceStub)
+    server.faces = {avatars.default_uuid: face_png('gray')}
+    server.calls = []
+    server.failures = []
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_cache(server, directory, **kwargs):
+    url = f"http://127.0.0.1:{server.server_address[1]}/avatars/{{}}?size=32"
+    return avatars.FaceCache(str(directory), url=url, max_workers=1, **kwargs)
+
+
+def test_retry_after_is_honoured(faces, tmp_path):
+    uuid = "0123456789abcdef0123456789abcdef"
+    faces.faces["01234567-89ab-cdef-0123-456789abcdef"] = face_png('red')
+    faces.failures = [(429, {"Retry-After": "1"})]
+    cache = stub_cache(faces, tmp_path / 'avatar_cache', backoff=0)
+
+    start = time.monotonic()
+    assert cache.update([uuid]) == 1
+    assert time.monotonic() - start >= 0.9
+    assert len(faces.calls) == 2
+    assert cache.face(uuid) is not None
+
+
+def test_atlas_keys_undashed_uuids_dashed(faces, tmp_path):
+    # player_uuids.json mixes both forms, the page dashes them before the lookup
+    uuids = {"Dashed": "11111111-2222-3333-4444-555555555555", "Plain": "AAAAAAAABBBBCCCCDDDDEEEEEEEEEEEE"}
+    faces.faces["11111111-2222-3333-4444-555555555555"] = face_png('red')
+    faces.faces["aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"] = face_png('blue')
+    cache = stub_cache(faces, tmp_path / 'avatar_cache')
+    cache.update(list(uuids.values()) + [avatars.default_uuid])
+
+    atlas = avatars.build_atlas(uuids.values(), cache, str(tmp_path / 'avatars'))
+    assert set(atlas["faces"]) == {"11111111-2222-3333-4444-555555555555", "aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"}
+    assert atlas["faces"]["aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"] != atlas["default"]
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import export
+
+
+def small_frames():
+    return {
+        "Ampelrennen": pd.DataFrame(
+            {"City": [61.5, np.nan, 70.25], "Jungle": [68.9, np.nan, np.nan]},
+            index=["Ex4cted", "nobody", "swiffle"]),
+        "Einer im Köcher": pd.DataFrame(
+            {"Burg": [12, 7], "Sum": [30, 7]}, index=["juvona", "__egE"]),
+    }
+
+
+def test_compact_round_trip_small(tmp_path):
+    path = str(tmp_path / 'records_data.min.json')
+    export.export_compact(small_frames(), path)
+
+    expected = [record for record in export.records_list(small_frames()) if record["scores"]]
+    assert export.load_compact(path) == expected
+    assert export.load_compact(path + '.gz') == expected
+
+
+def test_compact_keeps_integer_points(tmp_path):
+    path = str(tmp_path / 'records_data.min.json')
+    export.export_compact(small_frames(), path)
+
+    with open(path, 'rb') as f:
+        data = json.loads(f.read())
+    assert data["minigames"]["Einer im Köcher"]["values"] == [12, 30, 7, 7]
+
+
+def test_compact_round_trip_real_captures(frames, tmp_path):
+    path = str(tmp_path / 'records_data.min.json')
+    export.export_compact(frames, path)
+
+    expected = [record for record in export.records_list(frames) if record["scores"]]
+    assert export.load_compact(path) == expected
+    assert export.load_compact(path + '.gz') == expected
+
+
+def test_verify_compact_against_records_json(frames, tmp_path):
+    records_file = str(tmp_path / 'records_data.json')
+    compact_file = str(tmp_path / 'records_data.min.json')
+    export.export_records_json(frames, records_file)
+    export.export_compact(frames, compact_file)
+    assert export.verify_compact(compact_file, records_file)
+
+    with open(compact_file, 'rb') as f:
+        data = json.loads(f.read())
+    data["minigames"]["Ampelrennen"]["values"][0] = 0.0
+    with open(compact_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    assert not export.verify_compact(compact_file, records_file)
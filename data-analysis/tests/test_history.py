@@ -0,0 +1,74 @@
+import os
+import subprocess
+
+import export
+import history
+import ingest
+import normalize
+from history import RecordHistory
+
+
+lines = {
+    "Blockhüpfer": "TooltipEvent, Blockhüpfer City :  29 s  513 ms",
+    "Ampelrennen": "TooltipEvent, Ampelrennen Castle :  20 s  866 ms Street :  22 s  760 ms",
+}
+
+
+def capture(directory, player, minigames):
+    with open(os.path.join(directory, f"{player}.txt"), 'w', encoding='utf-8') as f:
+        f.write("".join(lines[minigame] + "\n" for minigame in minigames))
+
+
+def git(directory, *args, date=None):
+    env = dict(os.environ, GIT_AUTHOR_DATE=date or "", GIT_COMMITTER_DATE=date or "")
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   cwd=directory, env=env, check=True, capture_output=True)
+
+
+def frames_of(directory):
+    return export.minigame_frames(ingest.load_records(directory, serial=True))
+
+
+def test_capture_times_are_commit_times(tmp_path):
+    directory = str(tmp_path)
+    git(directory, 'init', '-q')
+    capture(directory, "Früh", ["Blockhüpfer"])
+    capture(directory, "Spät", ["Blockhüpfer"])
+    git(directory, 'add', '.')
+    git(directory, 'commit', '-q', '-m', 'captures', date="2025-01-01T00:00:00+00:00")
+    capture(directory, "Spät", ["Blockhüpfer", "Ampelrennen"])
+    capture(directory, "Neu", ["Blockhüpfer"])
+    for player in ("Früh", "Spät", "Neu"):
+        os.utime(os.path.join(directory, f"{player}.txt"), (2000, 2000))
+
+    times = ingest.capture_times(["Früh", "Spät", "Neu", "Keiner"], directory)
+
+    # committed and unchanged: the commit time, not the checkout's mtime
+    assert times["Früh"] == 1735689600
+    # changed or new since the last commit: the mtime
+    assert times["Spät"] == 2000
+    assert times["Neu"] == 2000
+    assert times["Keiner"] is None
+
+
+def test_truncated_captures_are_not_removals(tmp_path, capsys):
+    directory = str(tmp_path / 'in-new')
+    os.makedirs(directory)
+    capture(directory, "A", ["Blockhüpfer", "Ampelrennen"])
+    capture(directory, "B", ["Blockhüpfer"])
+
+    with RecordHistory(str(tmp_path / 'history.db')) as records:
+        first = frames_of(directory)
+        assert history.record_captures(records, first, directory) == len(normalize.frames_to_records(first))
+
+        # A's capture lost a minigame, B's is empty
+        capture(directory, "A", ["Blockhüpfer"])
+        capture(directory, "B", [])
+        for player in ("A", "B"):
+            os.utime(os.path.join(directory, f"{player}.txt"), (5000, 5000))
+        assert history.record_captures(records, frames_of(directory), directory) == 0
+
+        out = capsys.readouterr().out
+        assert "Skipped 2 broken captures: A (missing Ampelrennen), B (no minigame lines)" in out
+        assert [value for _, value in records.progression("A", "Ampelrennen", "Castle")] == [20.866]
+        assert "Blockhüpfer" in records.current_minigames()["B"]
@@ -0,0 +1,39 @@
+import os
+import threading
+
+import pytest
+
+import instrument
+
+
+@pytest.fixture
+def tracing(tmp_path):
+    instrument.enable(str(tmp_path / 'trace.json'), profile=['outer', 'inner', 'worker'])
+    yield tmp_path
+    instrument.enabled = False
+    instrument.profile_spans = set()
+
+
+def test_nested_profiled_spans(tracing):
+    @instrument.traced('inner')
+    def inner():
+        return sum(range(1000))
+
+    def worker():
+        with instrument.span('worker'):
+            inner()
+
+    with instrument.span('outer'):
+        assert inner() == 499500
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    # only the outermost profiled span writes a profile, the others run inside it
+    assert sorted(filename for filename in os.listdir(tracing) if filename.endswith('.prof')) == ['outer.prof']
+    assert instrument.totals()['inner']['calls'] == 2
+    assert set(instrument.totals()) == {'outer', 'inner', 'worker'}
+
+    # once it is done the next profiled span gets its own profile
+    inner()
+    assert os.path.exists(tracing / 'inner.prof')
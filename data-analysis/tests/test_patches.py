@@ -0,0 +1,111 @@
+import os
+import json
+import subprocess
+
+import export
+import patches
+
+
+def git(directory, *args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   cwd=directory, check=True, capture_output=True)
+
+
+def versions(frames):
+    """Exports of four data versions: a few players, everyone, one record improved, one player gone"""
+    players = sorted({player for frame in frames.values() for player in frame.index})
+    few = {minigame: frame[frame.index.isin(players[:10])] for minigame, frame in frames.items()}
+
+    improved = dict(frames)
+    frame = frames["Blockhüpfer"].copy()
+    player, map_name = frame.stack().index[0]
+    frame.loc[player, map_name] -= 1
+    improved["Blockhüpfer"] = frame
+
+    gone = {minigame: frame.drop(index=players[-1], errors='ignore') for minigame, frame in improved.items()}
+
+    uuids = {player: f"uuid-{i}" for i, player in enumerate(players)}
+    return [
+        (few, {player: uuids[player] for player in players[:10]}, {}),
+        (frames, uuids, {players[0]: {"rank": "Spieler"}}),
+        (improved, uuids, {players[0]: {"rank": "Premium"}}),
+        (gone, uuids, {players[0]: {"rank": "Premium"}}),
+    ]
+
+
+def write_exports(directory, frames, uuids, player_data):
+    export.export_records_json(frames, os.path.join(directory, 'records_data.json'))
+    export.export_compact(frames, os.path.join(directory, 'records_data.min.json'), compress=False)
+    for filename, data in (('player_uuids.json', uuids), ('player_data.json', player_data)):
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+
+def publish(tmp_path, frames, max_ratio=0.5):
+    """Publish every version into a git repo like the workflow does, returning each version's snapshot"""
+    source = str(tmp_path)
+    directory = str(tmp_path / 'updates')
+    git(source, 'init', '-q')
+
+    published = {}
+    for i, version in enumerate(versions(frames), 1):
+        write_exports(source, *version)
+        assert patches.update_patches(directory, source, max_ratio=max_ratio, now=i * 3600) == i
+        published[i] = patches.read_json(directory, f"snapshot-{i}.json")
+        git(source, 'add', '-A')
+        git(source, 'commit', '-q', '-m', f"version {i}")
+    return source, directory, published
+
+
+def test_every_patch_turns_its_version_into_the_export(frames, tmp_path):
+    source, directory, published = publish(tmp_path, frames)
+    manifest = patches.read_manifest(directory)
+    assert sorted(manifest["patches"]) == ["2", "3"]
+
+    with open(os.path.join(source, 'records_data.json'), 'r', encoding='utf-8') as f:
+        records = {patches.record_key(record): record for record in json.load(f) if record["scores"]}
+
+    for old, filename in manifest["patches"].items():
+        # the state a page cached at the old version, rebuilt from the snapshot git kept of it
+        before = patches.keyed(patches.published_snapshot(directory, int(old)))
+        assert before == patches.keyed(published[int(old)])
+
+        patch = patches.read_json(directory, filename)
+        after = patches.apply_patch(before, {name: patch[name] for name in patches.datasets if name in patch})
+        assert after == patches.load_state(source)
+        assert after["records"] == records
+
+    assert patches.verify_patches(directory, source)
+
+
+def test_big_patches_fall_back_to_the_snapshot(frames, tmp_path):
+    source, directory, _ = publish(tmp_path, frames)
+    manifest = patches.read_manifest(directory)
+
+    # version 1 holds 10 players, its patch would carry nearly the whole snapshot
+    assert "1" not in manifest["patches"]
+    assert not os.path.exists(os.path.join(directory, 'patch-1-4.json'))
+    assert patches.keyed(patches.read_json(directory, manifest["snapshot"])) == patches.load_state(source)
+
+    # nothing is small enough without a limit this strict, every page loads the snapshot
+    (tmp_path / 'strict').mkdir()
+    source, directory, _ = publish(tmp_path / 'strict', frames, max_ratio=0.0001)
+    manifest = patches.read_manifest(directory)
+    assert manifest["patches"] == {}
+    assert sorted(os.listdir(directory)) == ['manifest.json', 'snapshot-4.json']
+    assert patches.verify_patches(directory, source)
+
+
+def test_verify_catches_a_patch_that_does_not_replay(frames, tmp_path, capsys):
+    source, directory, _ = publish(tmp_path, frames)
+    manifest = patches.read_manifest(directory)
+
+    # a patch that ends at the snapshot for every key it touches but misses a change
+    path = os.path.join(directory, manifest["patches"]["2"])
+    patch = patches.read_json(directory, manifest["patches"]["2"])
+    patch["records"]["set"].pop(sorted(patch["records"]["set"])[0])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(patch, f)
+
+    assert not patches.verify_patches(directory, source)
+    assert "applied to version 2 does not give the exports" in capsys.readouterr().out
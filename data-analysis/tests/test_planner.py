@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+import planner
+from store import PlayerStore
+
+
+def entry(name, games):
+    return {"name": name, "minecraft_party": {"Gespielte Minispiele": games}}
+
+
+def captures(directory, players, mtime):
+    os.makedirs(directory, exist_ok=True)
+    for player in players:
+        path = os.path.join(directory, f"{player}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("TooltipEvent, Blockhüpfer City :  29 s  513 ms\n")
+        os.utime(path, (mtime, mtime))
+
+
+def test_without_snapshots_the_other_signals_share_the_weight(tmp_path, capsys):
+    directory = str(tmp_path / 'in-new')
+    captures(directory, ["A", "B"], mtime=1000)
+    now = 1000 + 10 * planner.day
+
+    with PlayerStore(str(tmp_path / 'players.db')) as players:
+        # stats fetched only after the captures, so nothing is known about games since them
+        players.record_stats([entry("A", 10), entry("B", 10)], {"A": 600, "B": 300}, now=now)
+        scores = planner.rescrape_scores(["A", "B", "C"], players, directory, top_players={"B"}, now=now)
+
+    assert "No values for games_since_capture" in capsys.readouterr().out
+    assert scores["games_since_capture"].isna().all()
+    assert np.isinf(scores.at["C", "priority"])
+
+    # monthly_time, capture_age and top_records weigh 1 each
+    assert scores.at["A", "priority"] == (1.0 + 1.0 + 0.0) / 3
+    assert scores.at["B", "priority"] == (0.5 + 1.0 + 1.0) / 3
+
+
+def test_games_since_capture_counts_when_known(tmp_path, capsys):
+    directory = str(tmp_path / 'in-new')
+    captures(directory, ["A", "B"], mtime=1000)
+
+    with PlayerStore(str(tmp_path / 'players.db')) as players:
+        players.record_stats([entry("A", 10), entry("B", 10)], {"A": 300, "B": 300}, now=500)
+        players.record_stats([entry("A", 30), entry("B", 10)], {"A": 300, "B": 300}, now=2000)
+        scores = planner.rescrape_scores(["A", "B"], players, directory, top_players=set(), now=3000)
+
+    assert "No values" not in capsys.readouterr().out
+    assert list(scores["games_since_capture"]) == [20, 0]
+    assert scores.at["A", "priority"] == (3.0 + 1.0 + 1.0) / 6
+    assert scores.at["B", "priority"] == 0.0
@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import normalize
+import ranking
+import recordstore
+from recordstore import RecordStore
+
+
+def records():
+    return pd.DataFrame([
+        ("A", "Ampelrennen", "Castle", 12.3),
+        ("B", "Ampelrennen", "Castle", 12.3),
+        ("C", "Ampelrennen", "Castle", 20.866),
+        ("A", "Duelle", "Sum", 41.0),
+        ("C", "Duelle", "Sum", 7.0),
+    ], columns=['player', 'minigame', 'map', 'value'])
+
+
+def test_values_come_back_as_parsed():
+    store = RecordStore.from_records(records())
+
+    assert list(store.top("Ampelrennen", "Castle")["value"]) == [12.3, 12.3, 20.866]
+    assert store.frame("Ampelrennen").loc["C", "Castle"] == 20.866
+    assert store.player_records("C").set_index("minigame").at["Ampelrennen", "value"] == 20.866
+
+
+def test_ranks_match_ranking(frames):
+    real = normalize.frames_to_records(frames)
+    store = RecordStore.from_records(real)
+
+    ranked = store.to_records(categorical=False).assign(rank=store.ranks())
+    expected = ranking.rank_records(real)
+    merged = ranked.merge(expected, on=['player', 'minigame', 'map'], suffixes=('', '_expected'))
+    assert len(merged) == len(expected)
+    assert (merged['rank'] == merged['rank_expected']).all()
+
+
+def test_cached_store_follows_captures_and_rules(tmp_path, monkeypatch, capsys):
+    directory = str(tmp_path / 'in-new')
+    os.makedirs(directory)
+    analysis_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for player in ("Proofreader", "Gobo9", "Ex4cted"):
+        shutil.copy(os.path.join(analysis_dir, 'in-new', f"{player}.txt"), directory)
+    path = str(tmp_path / 'records_store.npz')
+
+    def rebuilt():
+        store = recordstore.cached_store(path, directory)
+        return "saved to" in capsys.readouterr().out, store
+
+    assert rebuilt()[0]
+    assert not rebuilt()[0]
+
+    # a capture removed, even though no capture got newer
+    os.remove(os.path.join(directory, 'Gobo9.txt'))
+    changed, store = rebuilt()
+    assert changed and "Gobo9" not in store.players
+    assert not rebuilt()[0]
+
+    # a normalization rule changed
+    rules = dict(normalize.normalization_rules, Replika=dict(normalize.normalization_rules["Replika"],
+                                                            sum={"column": "Sum", "missing": 30}))
+    monkeypatch.setattr(normalize, 'normalization_rules', rules)
+    assert rebuilt()[0]
+
+    # snapshots of the float32 store are rebuilt, not loaded
+    np.savez(path, version=1, value=np.zeros(1, dtype=np.float32))
+    monkeypatch.undo()
+    assert rebuilt()[0]
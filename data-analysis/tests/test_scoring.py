@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+import normalize
+import ranking
+import scoring
+from recordstore import RecordStore
+
+
+def small_records():
+    """Ampelrennen (lower is better): twelve players on Castle, three on Street where L is fastest"""
+    players = list("ABCDEFGHIJKL")
+    rows = [(player, "Ampelrennen", "Castle", 10.0 + i) for i, player in enumerate(players)]
+    rows += [("L", "Ampelrennen", "Street", 5.0), ("A", "Ampelrennen", "Street", 6.0),
+             ("B", "Ampelrennen", "Street", 7.0)]
+    return pd.DataFrame(rows, columns=['player', 'minigame', 'map', 'value'])
+
+
+def evaluate(schemes):
+    return scoring.Evaluator(RecordStore.from_records(small_records())).evaluate(schemes)
+
+
+def test_current_scheme_reproduces_ranking(frames):
+    records = normalize.frames_to_records(frames)
+    expected = ranking.total_scores(ranking.minigame_scores(records))
+
+    totals = scoring.Evaluator(RecordStore.from_records(records)).evaluate({"current": {}})["current"]
+    assert np.allclose(totals.reindex(expected.index).to_numpy(), expected.to_numpy())
+
+    places = scoring.positions(totals.to_frame("current"))["current"]
+    assert list(places.sort_values().index) == list(expected.index)
+
+
+def test_top_n_and_min_records():
+    totals = evaluate({"current": {}, "top 5": {"top_n": 5}, "active maps": {"min_records": 5}})
+
+    # both maps count half: Castle ranks 1..10 score 100..10, ranks 11 and 12 nothing
+    assert totals.at["A", "current"] == 100 / 2 + 90 / 2
+    assert totals.at["J", "current"] == 10 / 2
+    assert totals.at["K", "current"] == 0
+    assert totals.at["L", "current"] == 100 / 2
+
+    # top 5 with points 100, 80, ..., 20
+    assert totals.at["E", "top 5"] == 20 / 2
+    assert (totals.loc[list("FGHIJK"), "top 5"] == 0).all()
+
+    # Street has only three records, so Castle is the only scored map and not split
+    assert totals.at["A", "active maps"] == 100
+    assert totals.at["L", "active maps"] == 0
+    assert totals["active maps"].sum() == sum(range(10, 101, 10))
+
+
+def test_position_changes_report_the_movers():
+    totals = evaluate({"current": {}, "street only": {"exclude_maps": [["Ampelrennen", "Castle"]]}})
+    changes = scoring.position_changes(totals, "street only")
+
+    assert list(changes.index[:3]) == ["L", "A", "B"]
+    assert changes.loc[["L", "A", "B"], "current"].tolist() == [3, 1, 2]
+    assert changes.loc[["L", "A", "B"], "change"].tolist() == [2, -1, -1]
+    assert (changes.drop(index=["L", "A", "B"])["change"] == 0).all()
+
+    summary = scoring.compare(totals)
+    assert summary.at["street only", "leader"] == "L"
+    assert summary.at["street only", "biggest_mover"] == "L (3 -> 1)"
+    assert summary.at["current", "max_shift"] == 0
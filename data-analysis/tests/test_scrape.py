@@ -0,0 +1,93 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import scrape
+
+analysis_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def captures(directory, tooltips):
+    os.makedirs(directory, exist_ok=True)
+    for player, lines in tooltips.items():
+        with open(os.path.join(directory, f"{player}.txt"), 'w', encoding='utf-8') as f:
+            f.write("".join(f"TooltipEvent, {line}\n" for line in lines))
+
+
+def test_import_is_light():
+    # driving the game must not pull in pandas or configure logging for the importer
+    code = ("import sys, logging, scrape; "
+            "print(sorted({'pandas', 'ingest', 'store', 'update_player_data', 'uuid_cache'} & set(sys.modules)), "
+            "logging.getLogger().handlers)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=analysis_dir)
+    assert result.stdout.strip() == "[] []"
+
+
+def test_short_leaderboards_are_not_rejected(tmp_path, capsys):
+    reference = tmp_path / 'in-new'
+    desktop = tmp_path / 'Desktop'
+    desktop.mkdir()
+
+    # a player with records in 14 minigames and one with all 24, both unchanged since the last capture
+    with open(os.path.join(analysis_dir, 'in-new', 'Proofreader.txt'), encoding='utf-8') as f:
+        lines = [line.strip().split(", ", 1)[1] for line in f if line.strip()]
+    tooltips = {"short": lines[:14], "full": lines[:24]}
+    captures(str(reference), tooltips)
+
+    driver = scrape.FakeDriver(str(desktop), tooltips, latency=0.002, open_latency=0.01)
+    scraper = scrape.RecordScraper(driver, desktop_path=str(desktop))
+    queue = scrape.ScrapeQueue(str(tmp_path / 'jobs.json'))
+    queue.add(list(tooltips))
+
+    counts = scraper.run_queue(queue, reference_dir=str(reference), open_timeout=0.5)
+
+    assert counts["validated"] == 2
+    assert scrape.previous_line_counts(list(tooltips), str(reference)) == {"short": 14, "full": 24}
+    assert "lines" not in capsys.readouterr().out
+
+
+def test_fewer_lines_than_last_capture_are_reported(tmp_path, capsys):
+    desktop = tmp_path / 'Desktop'
+    desktop.mkdir()
+    tooltips = {"player": ["Blockhüpfer City :  29 s  513 ms"]}
+
+    driver = scrape.FakeDriver(str(desktop), tooltips, latency=0.002, open_latency=0.01)
+    scraper = scrape.RecordScraper(driver, desktop_path=str(desktop))
+    captured = scraper.scrape_events(list(tooltips), expected_lines={"player": 3}, open_timeout=0.5)
+
+    assert captured == {"player": 1}
+    assert "player has 1 lines, 3 last time." in capsys.readouterr().out
+
+
+def test_drivers_must_implement_every_action(tmp_path):
+    class NoHover(scrape.ScrapeDriver):
+        def open_records(self, player):
+            pass
+
+        def close_records(self):
+            pass
+
+    with pytest.raises(TypeError, match="hover"):
+        NoHover()
+    assert isinstance(scrape.FakeDriver(str(tmp_path), {}), scrape.ScrapeDriver)
+    assert not scrape.PyAutoGUIDriver.__abstractmethods__
+
+
+def test_empty_previous_capture_is_no_reference(tmp_path):
+    with open(os.path.join(analysis_dir, 'in-new', 'Proofreader.txt'), encoding='utf-8') as f:
+        lines = [line.strip().split(", ", 1)[1] for line in f if line.strip()]
+    # demiu, Scuprum and Dubbly have 0-byte captures in in-new
+    captures(str(tmp_path / 'in-new'), {"demiu": []})
+    captures(str(tmp_path / 'Desktop'), {"demiu": lines[:3]})
+    reference = str(tmp_path / 'in-new' / 'demiu.txt')
+    path = str(tmp_path / 'Desktop' / 'demiu.txt')
+
+    assert os.path.getsize(reference) == 0
+    assert scrape.validate_capture(path, reference) == "only 3 minigame lines"
+    assert scrape.validate_capture(path, reference, min_lines=3) is None
+
+    captures(str(tmp_path / 'in-new'), {"demiu": lines[:4]})
+    assert scrape.validate_capture(path, reference).startswith("missing ")
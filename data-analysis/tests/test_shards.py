@@ -0,0 +1,64 @@
+import json
+import os
+
+import export
+import normalize
+import ranking
+
+
+def read(directory, filename):
+    with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_shard_ranks_match_ranking(frames, tmp_path):
+    directory = str(tmp_path)
+    export.export_shards(frames, directory)
+
+    records = normalize.frames_to_records(frames)
+    expected = {
+        (row.minigame, row.player, row.map): (int(rank), int(dense))
+        for row, rank, dense in zip(records.itertuples(index=False),
+                                    ranking.map_ranks(records, method='min'),
+                                    ranking.map_ranks(records, method='dense'))
+    }
+
+    manifest = read(directory, 'manifest.json')
+    players = read(directory, manifest["players"])
+    found = {}
+    for minigame, entry in manifest["minigames"].items():
+        for record in read(directory, entry["file"])["records"]:
+            assert players[record["name"]][minigame]["ranks"] == record["ranks"]
+            for map_name, rank in record["ranks"].items():
+                found[(minigame, record["name"], map_name)] = (rank, record["dense_ranks"][map_name])
+    assert found == expected
+
+
+def test_shards_sorted_by_first_map(frames, tmp_path):
+    directory = str(tmp_path)
+    export.export_shards(frames, directory)
+
+    for minigame, entry in read(directory, 'manifest.json')["minigames"].items():
+        shard = read(directory, entry["file"])
+        if not shard["maps"]:
+            continue
+        first = shard["maps"][0]
+        sign = -1 if shard["direction"] == "desc" else 1
+        keys = [(first not in record["scores"], sign * record["scores"].get(first, 0), record["name"])
+                for record in shard["records"]]
+        assert keys == sorted(keys), minigame
+
+
+def test_stale_shards_are_removed(frames, tmp_path):
+    directory = str(tmp_path)
+    export.export_shards(frames, directory)
+    for filename in ('old-minigame.json', 'blockhuepfer-renamed.json'):
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            f.write('{}')
+
+    export.export_shards({minigame: frame for minigame, frame in frames.items() if minigame != "Blockhüpfer"}, directory)
+
+    manifest = read(directory, 'manifest.json')
+    expected = {entry["file"] for entry in manifest["minigames"].values()} | {"players.json", "manifest.json"}
+    assert set(os.listdir(directory)) == expected
+    assert export.shard_name("Blockhüpfer") not in expected
@@ -0,0 +1,104 @@
+import sqlite3
+
+import store
+import update_player_data
+from store import PlayerStore
+
+
+def entry(name, games, rank="Spieler"):
+    return {"name": name, "rank": rank, "minecraft_party": {"Gespielte Minispiele": games}}
+
+
+class FakeFetcher:
+    """PlayerDataFetcher answering from a dict of entries and monthly times"""
+
+    def __init__(self, entries, monthly_time):
+        self.entries = entries
+        self.monthly_time = monthly_time
+        self.fetched = []
+
+    def fetch_all(self, player_names):
+        self.fetched.append(list(player_names))
+        result = update_player_data.PlayerDataResult()
+        for name in player_names:
+            result.add(self.entries[name], self.monthly_time.get(name, 0))
+        return result
+
+
+def test_changed_time_only_moves_on_a_change(tmp_path):
+    with PlayerStore(str(tmp_path / 'players.db')) as players:
+        assert players.record_stats([entry("A", 10)], {"A": 500}, now=100) == 1
+        assert players.record_stats([entry("A", 10)], {"A": 200}, now=200) == 0
+        assert players.refresh_state()["A"] == {"fetched": 200, "changed": 100, "monthly_time": 200}
+
+        assert players.record_stats([entry("A", 12)], {}, now=300) == 1
+        assert players.refresh_state()["A"] == {"fetched": 300, "changed": 300, "monthly_time": 200}
+        assert len(players.history("A")) == 2
+
+
+def test_incremental_refresh_reads_and_writes_the_store(tmp_path):
+    day = update_player_data.day
+    entries = {name: entry(name, 10) for name in ("active", "dormant", "new")}
+    fetcher = FakeFetcher(entries, {"active": store.active_threshold + 1})
+    data_file = str(tmp_path / 'player_data.json')
+
+    with PlayerStore(str(tmp_path / 'players.db')) as players:
+        players.record_stats([entries["dormant"]], {}, now=0)
+        players.record_stats([entries["active"]], {"active": store.active_threshold + 1}, now=0)
+
+        now = 20 * day
+        assert update_player_data.incremental_refresh(list(entries), players, data_file, fetcher=fetcher, now=now)
+        # dormant was fetched 20 days ago and is only due every 2 days, but active players and new ones every run
+        assert sorted(fetcher.fetched[0]) == ["active", "dormant", "new"]
+
+        assert not update_player_data.incremental_refresh(list(entries), players, data_file, fetcher=fetcher, now=now + 60)
+        # new changed just now, so it counts as recent; dormant waits two days
+        assert sorted(fetcher.fetched[1]) == ["active", "new"]
+        assert players.refresh_state()["dormant"]["fetched"] == now
+
+
+def test_sync_round_trip(tmp_path):
+    path = str(tmp_path / 'player_store.json')
+    with PlayerStore(str(tmp_path / 'ci.db')) as ci:
+        ci.add_players({"A": "uuid-a", "B": None}, now=50)
+        ci.record_stats([entry("A", 1)], {"A": 30}, now=100)
+        ci.record_stats([entry("A", 2)], {"A": 40}, now=200)
+        ci.record_stats([entry("B", 5)], {"B": 0}, now=200)
+        ci.export_sync(path, now=200)
+        expected = (ci.refresh_state(), ci.history("A"), ci.player_uuids(), ci.latest_stats("A"))
+
+    with store.open_store(str(tmp_path / 'local.db'), path) as local:
+        assert (local.refresh_state(), local.history("A"), local.player_uuids(), local.latest_stats("A")) == expected
+        # importing again changes nothing
+        assert local.import_sync(path) == 0
+        assert len(local.history("A")) == 2
+
+
+def test_sync_keeps_newer_local_stats_and_recent_snapshots(tmp_path):
+    day = store.day
+    path = str(tmp_path / 'player_store.json')
+    with PlayerStore(str(tmp_path / 'ci.db')) as ci:
+        for i, games in enumerate((1, 2, 3, 4)):
+            ci.record_stats([entry("A", games)], {}, now=i * 30 * day)
+        ci.export_sync(path, keep_days=45, now=90 * day)
+
+    with PlayerStore(str(tmp_path / 'local.db')) as local:
+        local.record_stats([entry("A", 9)], {"A": 7}, now=100 * day)
+        assert local.import_sync(path) == 0
+        assert local.latest_stats("A") == entry("A", 9)
+        # the snapshots of the last 45 days plus the one before them
+        assert [snapshot["fetched"] for snapshot in local.history("A")] == [30 * day, 60 * day, 90 * day, 100 * day]
+
+
+def test_old_stores_get_a_changed_column(tmp_path):
+    path = str(tmp_path / 'players.db')
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE stats (player TEXT PRIMARY KEY COLLATE NOCASE, fetched REAL NOT NULL, rank TEXT,
+                            monthly_time INTEGER NOT NULL DEFAULT 0, hash TEXT NOT NULL, entry TEXT NOT NULL);
+        INSERT INTO stats VALUES ('A', 123, 'Spieler', 5, 'x', '{"name": "A"}');
+    """)
+    db.close()
+
+    with PlayerStore(path) as players:
+        assert players.refresh_state() == {"A": {"fetched": 123, "changed": 123, "monthly_time": 5}}
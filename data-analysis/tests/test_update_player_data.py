@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+import email.utils
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from update_player_data import PlayerDataFetcher
+
+
+def api_response(rank="Premium", games=120, monthly_time=450):
+    return {
+        "playerInfo": {"rank": {"name": rank}},
+        "stats": {"mp": {
+            "global": {"wins": 3, "games": games, "minigame_wins": 40, "minigames": games * 6,
+                       "time": 123456, "points": 789, "rank_points": 56},
+            "monthly": {"time": monthly_time},
+        }},
+    }
+
+
+class CytooxienStub(BaseHTTPRequestHandler):
+    """User endpoint of the Cytooxien API, answering from server.players"""
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.server.calls.append((time.monotonic(), self.path))
+        # queued (status, headers) answers go out before the real one
+        if self.server.failures:
+            status, headers = self.server.failures.pop(0)
+            self._send(status, headers=headers)
+            return
+        name = self.path.rsplit('/', 1)[-1]
+        if name in self.server.players:
+            self._send(200, self.server.players[name])
+        else:
+            self._send(404, {"error": "unknown user"})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CytooxienStub)
+    server.players = {"Proofreader": api_response()}
+    server.calls = []
+    server.failures = []
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_fetcher(server, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return PlayerDataFetcher(base_url=f"http://127.0.0.1:{server.server_address[1]}/user/{{}}", **kwargs)
+
+
+def test_retry_after_seconds_are_honoured(api):
+    api.failures = [(429, {"Retry-After": "1"})]
+    result = stub_fetcher(api, backoff=0).fetch_all(["Proofreader"])
+
+    assert len(api.calls) == 2
+    assert api.calls[1][0] - api.calls[0][0] >= 0.9
+    entry = result.player_data["Proofreader"]
+    assert entry["name"] == "Proofreader"
+    assert entry["rank"] == "Premium"
+    assert entry["minecraft_party"]["Gespielte Minispiele"] == 720
+    assert entry["minecraft_party"]["Winrate %"] == 2.5
+    assert result.monthly_time["Proofreader"] == 450
+
+
+def test_retry_after_http_date(api):
+    soon = email.utils.formatdate(time.time() + 2, usegmt=True)
+    api.failures = [(503, {"Retry-After": soon}), (429, {"Retry-After": "later"})]
+    result = stub_fetcher(api).fetch_all(["Proofreader"])
+
+    assert len(api.calls) == 3
+    # the date is honoured, the unparsable value falls back to the backoff
+    assert api.calls[1][0] - api.calls[0][0] >= 0.5
+    assert api.calls[2][0] - api.calls[1][0] < 0.5
+    assert result.player_data["Proofreader"]["rank"] == "Premium"
+
+
+def test_gives_up_after_retries(api):
+    api.failures = [(500, {})] * 3
+    result = stub_fetcher(api, retries=2).fetch_all(["Proofreader"])
+
+    assert len(api.calls) == 3
+    assert result.player_data["Proofreader"]["rank"] == "Error"
+
+
+def test_client_errors_are_not_retried(api):
+    result = stub_fetcher(api).fetch_all(["Nobody"])
+
+    assert len(api.calls) == 1
+    assert result.player_data["Nobody"]["rank"] == "Error"
+    assert result.monthly_time["Nobody"] == 0
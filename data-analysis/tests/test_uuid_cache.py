@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+import email.utils
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import uuid_cache
+from uuid_cache import UUIDCache
+
+
+class MojangStub(BaseHTTPRequestHandler):
+    """Profile and bulk name lookup endpoints of the Mojang API, answering from server.profiles"""
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _failure(self):
+        # queued (status, headers) answers go out before the real one
+        if self.server.failures:
+            status, headers = self.server.failures.pop(0)
+            self._send(status, headers=headers)
+            return True
+        return False
+
+    def do_GET(self):
+        self.server.calls.append(('GET', self.path))
+        if self._failure():
+            return
+        uuid = self.path.rsplit('/', 1)[-1]
+        if uuid in self.server.profiles:
+            self._send(200, {"id": uuid, "name": self.server.profiles[uuid]})
+        else:
+            self._send(204)
+
+    def do_POST(self):
+        names = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.calls.append(('POST', names))
+        if self._failure():
+            return
+        if len(names) > 10:
+            self._send(400, {"error": "too many names"})
+            return
+        by_name = {name.lower(): uuid for uuid, name in self.server.profiles.items()}
+        self._send(200, [{"id": by_name[name.lower()], "name": self.server.profiles[by_name[name.lower()]]}
+                         for name in names if name.lower() in by_name])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mojang():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MojangStub)
+    server.profiles = {f"{i:032x}": f"Player{i}" for i in range(1, 26)}
+    server.calls = []
+    server.failures = []
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_cache(server, path, **kwargs):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    kwargs.setdefault('backoff', 0.01)
+    return UUIDCache(str(path), profile_url=base + "/profile/{}", bulk_url=base + "/bulk", **kwargs)
+
+
+def test_names_resolved_in_batches_of_ten(mojang, tmp_path):
+    cache = stub_cache(mojang, tmp_path / 'uuid_cache.json')
+    names = [f"Player{i}" for i in range(1, 24)] + ["Nobody1", "Nobody2"]
+
+    resolved = cache.uuids_for(names)
+
+    posts = [body for method, body in mojang.calls if method == 'POST']
+    assert [len(batch) for batch in posts] == [10, 10, 5]
+    assert sorted(name for batch in posts for name in batch) == sorted(names)
+    assert resolved["Player7"] == f"{7:032x}"
+    assert resolved["Nobody1"] is None and resolved["Nobody2"] is None
+
+
+def test_cached_names_need_no_requests(mojang, tmp_path):
+    path = tmp_path / 'uuid_cache.json'
+    cache = stub_cache(mojang, path)
+    cache.uuids_for(["Player1", "Player2", "Nobody"])
+    cache.save()
+    mojang.calls.clear()
+
+    # unknown names are remembered as well
+    reloaded = stub_cache(mojang, path)
+    assert reloaded.uuids_for(["player1", "Player2", "Nobody"]) == {
+        "player1": f"{1:032x}", "Player2": f"{2:032x}", "Nobody": None}
+    assert mojang.calls == []
+
+    # only the misses are looked up
+    reloaded.uuids_for(["Player1", "Player3"])
+    assert mojang.calls == [('POST', ["Player3"])]
+
+
+def test_expired_entries_are_looked_up_again(mojang, tmp_path):
+    path = tmp_path / 'uuid_cache.json'
+    cache = stub_cache(mojang, path)
+    cache.uuids_for(["Player1"])
+    cache.names_for([f"{2:032x}"])
+    cache.save()
+    mojang.calls.clear()
+
+    stub_cache(mojang, path, ttl=3600).uuids_for(["Player1"])
+    assert mojang.calls == []
+
+    expired = stub_cache(mojang, path, ttl=0)
+    expired.uuids_for(["Player1"])
+    expired.names_for([f"{2:032x}"])
+    assert mojang.calls == [('POST', ["Player1"]), ('GET', f"/profile/{2:032x}")]
+
+
+def test_name_changes_are_kept_in_the_history(mojang, tmp_path):
+    uuid = f"{5:032x}"
+    cache = stub_cache(mojang, tmp_path / 'uuid_cache.json', ttl=0)
+    assert cache.names_for([uuid]) == {uuid: "Player5"}
+
+    mojang.profiles[uuid] = "Renamed5"
+    assert cache.names_for([uuid]) == {uuid: "Renamed5"}
+    assert cache.history(uuid) == ["Player5", "Renamed5"]
+    # the old name is no longer cached as taken by this UUID
+    assert "player5" not in cache.names
+
+
+def test_retry_after_seconds_are_honoured(mojang, tmp_path):
+    mojang.failures = [(429, {"Retry-After": "1"})]
+    cache = stub_cache(mojang, tmp_path / 'uuid_cache.json', backoff=0)
+
+    start = time.monotonic()
+    assert cache.uuids_for(["Player1"]) == {"Player1": f"{1:032x}"}
+    assert time.monotonic() - start >= 0.9
+    assert cache.requests == 2
+
+
+def test_retry_after_http_date_does_not_crash(mojang, tmp_path):
+    past = email.utils.formatdate(time.time() - 60, usegmt=True)
+    mojang.failures = [(503, {"Retry-After": past}), (429, {"Retry-After": "soon"})]
+    cache = stub_cache(mojang, tmp_path / 'uuid_cache.json')
+
+    assert cache.names_for([f"{3:032x}"]) == {f"{3:032x}": "Player3"}
+    assert cache.requests == 3
+
+
+def test_gives_up_after_retries(mojang, tmp_path):
+    mojang.failures = [(429, {})] * 3
+    cache = stub_cache(mojang, tmp_path / 'uuid_cache.json', retries=2)
+
+    assert cache.uuids_for(["Player1"]) == {"Player1": None}
+    assert cache.requests == 3
+    # a failed lookup is not cached as unknown
+    assert "player1" not in cache.names
+
+
+def test_retry_delay():
+    def response(retry_after=None):
+        result = requests.Response()
+        if retry_after is not None:
+            result.headers['Retry-After'] = retry_after
+        return result
+
+    assert uuid_cache.retry_delay(None, 2.0) == 2.0
+    assert uuid_cache.retry_delay(response(), 2.0) == 2.0
+    assert uuid_cache.retry_delay(response("7"), 2.0) == 7.0
+    assert uuid_cache.retry_delay(response("not a date"), 2.0) == 2.0
+    assert uuid_cache.retry_delay(response(email.utils.formatdate(time.time() - 60, usegmt=True)), 2.0) == 0.0
+    assert 25 <= uuid_cache.retry_delay(response(email.utils.formatdate(time.time() + 30, usegmt=True)), 2.0) <= 30
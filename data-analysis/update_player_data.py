@@ -4,92 +4,352 @@ import os
 from tqdm import tqdm
 import logging
 import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import instrument
+from store import PlayerStore, active_threshold, open_store
+from uuid_cache import retry_delay
 
 keywords = ['Premium+', 'Premium', 'Bauteam', 'Spieler', 'Entwickler', 'VIP', 'Content', 'Supporter', 'Owner', 'Moderator', 'Translator']
 
-player_data = {}
-player_categories = {keyword: [] for keyword in keywords}
+api_url = "https://api.cytooxien.de/user/{}"
 
-def fetch_player_data(player_name, log=False):
-    url = f"https://api.cytooxien.de/user/{player_name}"
-    
+day = 24 * 60 * 60
+
+# minimum age of a player's data before the incremental refresh fetches it again
+refresh_intervals = {
+    "active": 0,           # played this month: every run
+    "recent": 0,           # stats changed within the last week: every run
+    "dormant": 2 * day,    # changed within the last month
+    "inactive": 7 * day,   # nothing changed for a month or more
+}
+
+
+class PlayerDataResult:
+    """Player data of one refresh, plus the players grouped by rank"""
+
+    def __init__(self):
+        self.player_data = {}
+        self.player_categories = {keyword: [] for keyword in keywords}
+        self.monthly_time = {}
+        self.errors = []
+
+    def add(self, entry: Dict[str, Any], monthly_time: int = 0):
+        """Add the entry of a single player"""
+        player_name = entry["name"]
+        self.player_data[player_name] = entry
+        self.monthly_time[player_name] = monthly_time
+
+        if entry["rank"] in keywords:
+            self.player_categories[entry["rank"]].append(player_name)
+        elif entry["rank"] == "Error":
+            self.errors.append(player_name)
+
+    def export(self, output_file: str = 'player_data.json'):
+        """Write the player data to output_file"""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.player_data, f, ensure_ascii=False, indent=4)
+
+
+class TokenBucket:
+    """Async token bucket allowing rate requests per second with bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def error_entry(player_name: str) -> Dict[str, Any]:
+    """Entry of a player whose data could not be fetched"""
+    return {
+        "name": player_name,
+        "rank": "Error",
+        "minecraft_party": {}
+    }
+
+
+def monthly_playtime(data: Dict[str, Any]) -> int:
+    """Monthly MP time of an API response, 0 if missing"""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if log: 
-            logging.info(f"Fetching API data for player: {player_name}")
-        
-        player_data[player_name] = {
-            "name": player_name,
-            "rank": "None",
-            "minecraft_party": {}
-        }
-        
-        if 'playerInfo' in data and 'rank' in data['playerInfo']:
-            rank_name = data['playerInfo']['rank']['name']
-            if rank_name in keywords:
-                player_data[player_name]["rank"] = rank_name
-                player_categories[rank_name].append(player_name)
-                if log: 
-                    logging.info(f"Player rank: {rank_name}")
-            else:
-                player_data[player_name]["rank"] = rank_name
-        
-        if 'stats' in data and 'mp' in data['stats'] and 'global' in data['stats']['mp']:
-            mp_stats = data['stats']['mp']['global']
-            
-            wins = mp_stats.get('wins', 0)
-            games = mp_stats.get('games', 0)
-            minigame_wins = mp_stats.get('minigame_wins', 0)
-            minigames = mp_stats.get('minigames', 0)
-            
-            winrate = round((wins / games * 100), 2) if games > 0 else 0
-            minigame_winrate = round((minigame_wins / minigames * 100), 2) if minigames > 0 else 0
-            
-            stat_mapping = {
-                'Gewonnene Spiele': wins,
-                'Gewonnene Minispiele': minigame_wins,
-                'Gespielte Spiele': games,
-                'Gespielte Minispiele': minigames,
-                'Spielzeit': format_time(mp_stats.get('time', 0)),
-                'Punkte': mp_stats.get('points', 0),
-                'Rang': mp_stats.get('rank_points', 0),
-                'Winrate %': winrate,
-                'Minigame Winrate %': minigame_winrate
-            }
-            
-            player_data[player_name]["minecraft_party"] = stat_mapping
-            
-            if log: 
-                logging.info("Found Minecraft Party data")
-                for stat_name, stat_value in stat_mapping.items():
-                    logging.info(f"Scraped: {stat_name} = {stat_value}")
-        else:
-            if log:
-                logging.warning(f"No Minecraft Party data found for {player_name}")
-        
-        return player_data[player_name]["rank"]
-        
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching data for {player_name}: {e}")
-        player_data[player_name] = {
-            "name": player_name,
-            "rank": "Error",
-            "minecraft_party": {}
-        }
-        return "Error"
-    except json.JSONDecodeError as e:
-        logging.error(f"Error parsing JSON for {player_name}: {e}")
-        player_data[player_name] = {
-            "name": player_name,
-            "rank": "Error",
-            "minecraft_party": {}
+        return data['stats']['mp']['monthly']['time'] or 0
+    except (KeyError, TypeError):
+        return 0
+
+
+def build_player_entry(player_name: str, data: Dict[str, Any], log: bool = False) -> Dict[str, Any]:
+    """Build the player_data.json entry from an API response"""
+    entry = {
+        "name": player_name,
+        "rank": "None",
+        "minecraft_party": {}
+    }
+
+    if 'playerInfo' in data and 'rank' in data['playerInfo']:
+        rank_name = data['playerInfo']['rank']['name']
+        entry["rank"] = rank_name
+        if log and rank_name in keywords:
+            logging.info(f"Player rank: {rank_name}")
+
+    if 'stats' in data and 'mp' in data['stats'] and 'global' in data['stats']['mp']:
+        mp_stats = data['stats']['mp']['global']
+
+        wins = mp_stats.get('wins', 0)
+        games = mp_stats.get('games', 0)
+        minigame_wins = mp_stats.get('minigame_wins', 0)
+        minigames = mp_stats.get('minigames', 0)
+
+        winrate = round((wins / games * 100), 2) if games > 0 else 0
+        minigame_winrate = round((minigame_wins / minigames * 100), 2) if minigames > 0 else 0
+
+        stat_mapping = {
+            'Gewonnene Spiele': wins,
+            'Gewonnene Minispiele': minigame_wins,
+            'Gespielte Spiele': games,
+            'Gespielte Minispiele': minigames,
+            'Spielzeit': format_time(mp_stats.get('time', 0)),
+            'Punkte': mp_stats.get('points', 0),
+            'Rang': mp_stats.get('rank_points', 0),
+            'Winrate %': winrate,
+            'Minigame Winrate %': minigame_winrate
         }
-        return "Error"
+
+        entry["minecraft_party"] = stat_mapping
+
+        if log:
+            logging.info("Found Minecraft Party data")
+            for stat_name, stat_value in stat_mapping.items():
+                logging.info(f"Scraped: {stat_name} = {stat_value}")
+    else:
+        if log:
+            logging.warning(f"No Minecraft Party data found for {player_name}")
+
+    return entry
+
+
+class PlayerDataFetcher:
+    """Fetches player stats concurrently
+
+    Requests share one keep-alive session, are limited by a token bucket and
+    a bound on in-flight requests, and are retried with exponential backoff on
+    429 and 5xx responses or connection errors, or after the response's
+    Retry-After (uuid_cache.retry_delay).
+    """
+
+    def __init__(self, base_url: str = api_url, concurrency: int = 10, rate: float = 40.0,
+                 burst: Optional[float] = None, retries: int = 4, backoff: float = 0.5,
+                 timeout: float = 10, log: bool = False):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst if burst is not None else concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.log = log
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @instrument.traced("http")
+    def _get(self, url: str) -> requests.Response:
+        response = self.session.get(url, timeout=self.timeout)
+        instrument.count("requests")
+        instrument.count("bytes_downloaded", len(response.content))
+        return response
+
+    async def fetch_player_data(self, player_name: str, bucket: TokenBucket, semaphore: asyncio.Semaphore,
+                                executor: ThreadPoolExecutor) -> Tuple[Dict[str, Any], int]:
+        """Fetch and parse the data of a single player, with its monthly MP time"""
+        url = self.base_url.format(player_name)
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.retries + 1):
+            await bucket.acquire()
+            delay = self.backoff * 2 ** attempt
+
+            async with semaphore:
+                try:
+                    response = await loop.run_in_executor(executor, self._get, url)
+                except requests.exceptions.RequestException as e:
+                    logging.warning(f"Request for {player_name} failed (attempt {attempt + 1}): {e}")
+                    response = None
+
+            if response is not None and response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError as e:
+                    logging.error(f"Error parsing JSON for {player_name}: {e}")
+                    return error_entry(player_name), 0
+
+                if self.log:
+                    logging.info(f"Fetching API data for player: {player_name}")
+                return build_player_entry(player_name, data, log=self.log), monthly_playtime(data)
+
+            if response is not None and response.status_code != 429 and response.status_code < 500:
+                logging.error(f"Error fetching data for {player_name}: HTTP {response.status_code}")
+                return error_entry(player_name), 0
+
+            if attempt < self.retries:
+                delay = retry_delay(response, delay)
+                instrument.count("retries")
+                await asyncio.sleep(delay)
+
+        logging.error(f"Error fetching data for {player_name}: giving up after {self.retries + 1} attempts")
+        return error_entry(player_name), 0
+
+    async def fetch_all_async(self, player_names: List[str],
+                              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> PlayerDataResult:
+        """Fetch all players, calling progress with every finished entry"""
+        bucket = TokenBucket(self.rate, self.burst)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(player_name):
+            entry, monthly_time = await self.fetch_player_data(player_name, bucket, semaphore, executor)
+            if progress is not None:
+                progress(entry)
+            return entry, monthly_time
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            entries = await asyncio.gather(*(fetch_one(player_name) for player_name in player_names))
+
+        # gather keeps the input order, so player_data.json stays in player list order
+        result = PlayerDataResult()
+        for entry, monthly_time in entries:
+            result.add(entry, monthly_time)
+        return result
+
+    @instrument.traced("fetch_players")
+    def fetch_all(self, player_names: List[str],
+                  progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> PlayerDataResult:
+        """Blocking wrapper around fetch_all_async"""
+        return asyncio.run(self.fetch_all_async(player_names, progress=progress))
+
+
+@instrument.traced()
+def fetch_player_data(player_name: str, log: bool = False) -> Dict[str, Any]:
+    """Fetch the entry of a single player"""
+    return PlayerDataFetcher(log=log).fetch_all([player_name]).player_data[player_name]
+
+
+class RefreshState:
+    """Per-player fetch bookkeeping of the incremental refresh
+
+    When each player was last fetched, when their data last changed and
+    their monthly MP time, as PlayerStore.record_stats keeps them in the
+    store's stats table.
+    """
+
+    def __init__(self, store: PlayerStore):
+        self.players = store.refresh_state()
+
+    def tier(self, player_name: str, now: float) -> str:
+        """Activity tier deciding how often a player is refreshed"""
+        state = self.players[player_name]
+        if state.get("monthly_time", 0) > active_threshold:
+            return "active"
+
+        idle = now - state.get("changed", 0)
+        if idle < 7 * day:
+            return "recent"
+        if idle < 30 * day:
+            return "dormant"
+        return "inactive"
+
+    def is_due(self, player_name: str, now: float) -> bool:
+        """Whether a player's data is old enough to be fetched again"""
+        if player_name not in self.players:
+            return True
+        interval = refresh_intervals[self.tier(player_name, now)]
+        return now - self.players[player_name].get("fetched", 0) >= interval
+
+    def due_players(self, player_names: List[str], now: float, limit: Optional[int] = None) -> List[str]:
+        """Players to fetch, most active and most overdue first"""
+        due = [player_name for player_name in player_names if self.is_due(player_name, now)]
+        due.sort(key=lambda player_name: (
+            -self.players.get(player_name, {}).get("monthly_time", float('inf')),
+            self.players.get(player_name, {}).get("fetched", 0),
+        ))
+        return due[:limit] if limit is not None else due
+
+
+def merge_player_data(player_names: List[str], old_data: Dict[str, Any],
+                      fetched: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge freshly fetched entries into the previous player_data.json content
+
+    Keeps the player list order; players that were not fetched or failed
+    keep their previous entry.
+    """
+    new_data = {}
+    for player_name in player_names:
+        entry = fetched.get(player_name)
+        if entry is None or entry["rank"] == "Error":
+            entry = old_data.get(player_name, entry)
+        if entry is not None:
+            new_data[player_name] = entry
+    return new_data
+
+
+@instrument.traced()
+def incremental_refresh(player_names: List[str], store: PlayerStore, data_file: str = 'player_data.json',
+                        fetcher: Optional[PlayerDataFetcher] = None, limit: Optional[int] = None,
+                        now: Optional[float] = None) -> bool:
+    """Refresh only the players that are due and rewrite data_file only if something changed
+
+    Which players are due is read from store, and the fetched entries are
+    recorded there. Failed fetches keep the previous entry and stay due for
+    the next run. Returns whether data_file was rewritten.
+    """
+    now = time.time() if now is None else now
+    fetcher = fetcher or PlayerDataFetcher()
+    state = RefreshState(store)
+
+    old_data = {}
+    if os.path.exists(data_file):
+        with open(data_file, 'r', encoding='utf-8') as f:
+            old_data = json.load(f)
+
+    due = state.due_players(player_names, now, limit=limit)
+    print(f"Refreshing {len(due)} of {len(player_names)} players")
+
+    result = fetcher.fetch_all(due)
+    store.add_players({player_name: None for player_name in player_names}, now=now)
+    changed = store.record_stats([entry for entry in result.player_data.values() if entry["rank"] != "Error"],
+                                 result.monthly_time, now=now)
+
+    new_data = merge_player_data(player_names, old_data, result.player_data)
+
+    print(f"{changed} players changed, {len(result.errors)} failed")
+    if new_data == old_data:
+        print(f"No changes, {data_file} left untouched")
+        return False
+
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(new_data, f, ensure_ascii=False, indent=4)
+    print(f"Data exported to {data_file}")
+    return True
+
 
 def format_time(milliseconds):
     if milliseconds == 0:
@@ -110,16 +370,37 @@ def format_time(milliseconds):
         return f"{seconds}s"
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Refresh player_data.json from the Cytooxien API")
+    parser.add_argument('--full', action='store_true', help="refetch every player instead of only the due ones")
+    parser.add_argument('--limit', type=int, default=None, help="fetch at most this many players")
+    args = parser.parse_args()
+
     import helpers as h
-    playerList = h.assemblePlayerList()
-    
-    progress_bar = tqdm(playerList, desc="Fetching Progress", unit="player")
-    for player_name in progress_bar:
-        last_rank = fetch_player_data(player_name, log=False)
-        progress_bar.set_postfix(last_rank=last_rank, last_player=player_name)
-        time.sleep(0.2)
-    
-    with open('player_data.json', 'w', encoding='utf-8') as f:
-        json.dump(player_data, f, ensure_ascii=False, indent=4)
-    
-    print("Data exported to player_data.json")
\ No newline at end of file
+    players = open_store()
+    playerList = h.assemblePlayerList(store=players)
+
+    if not args.full:
+        incremental_refresh(playerList, players, limit=args.limit)
+    else:
+        progress_bar = tqdm(total=len(playerList), desc="Fetching Progress", unit="player")
+
+        def on_player_done(entry):
+            progress_bar.update(1)
+            progress_bar.set_postfix(last_rank=entry["rank"], last_player=entry["name"])
+
+        result = PlayerDataFetcher().fetch_all(playerList[:args.limit], progress=on_player_done)
+        progress_bar.close()
+
+        result.export('player_data.json')
+        players.record_stats([entry for entry in result.player_data.values() if entry["rank"] != "Error"],
+                             result.monthly_time)
+
+        print("Data exported to player_data.json")
+        if result.errors:
+            print(f"Failed to fetch {len(result.errors)} players: {', '.join(result.errors)}")
+
+    players.export_sync()
+    players.close()
+    instrument.finish()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import email.utils
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+import instrument
+
+
+profile_url = "https://sessionserver.mojang.com/session/minecraft/profile/{}"
+bulk_url = "https://api.minecraftservices.com/minecraft/profile/lookup/bulk/byname"
+
+# the bulk endpoint accepts at most 10 names per request
+bulk_size = 10
+
+cache_version = 1
+
+
+def plain_uuid(uuid: str) -> str:
+    """UUID without dashes, as the Mojang API returns it"""
+    return uuid.replace('-', '').lower()
+
+
+def dashed_uuid(uuid: str) -> str:
+    """UUID in the dashed form used by player_uuids.json"""
+    uuid = plain_uuid(uuid)
+    return f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}"
+
+
+def retry_delay(response: Optional[requests.Response], default: float) -> float:
+    """Seconds to wait before a retry: the response's Retry-After, in seconds or as an HTTP-date, else default"""
+    retry_after = response.headers.get('Retry-After', '').strip() if response is not None else ''
+    if retry_after.isdigit():
+        return float(retry_after)
+    if retry_after:
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return default
+        return max(0.0, when.timestamp() - time.time())
+    return default
+
+
+class UUIDCache:
+    """Persistent UUID <-> name resolution cache
+
+    Answers from Mojang are kept for ttl seconds (unknown names too, so
+    misspelled names are not looked up on every run). Names are resolved
+    with the batched profile lookup, UUIDs one by one as Mojang has no batch
+    endpoint for them. Every name a UUID is seen with is kept in its history,
+    since Mojang no longer serves name histories itself.
+    """
+
+    def __init__(self, path: str = 'uuid_cache.json', ttl: float = 7 * 24 * 60 * 60,
+                 max_workers: int = 10, retries: int = 3, backoff: float = 1.0, timeout: float = 10,
+                 profile_url: str = profile_url, bulk_url: str = bulk_url):
+        self.path = path
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.profile_url = profile_url
+        self.bulk_url = bulk_url
+
+        self.profiles = {}
+        self.names = {}
+        self.requests = 0
+        self._dirty = False
+        self.session = requests.Session()
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable UUID cache {path}: {e}")
+                data = {}
+            if data.get('version') == cache_version:
+                self.profiles = data.get('profiles', {})
+                self.names = data.get('names', {})
+
+    def _fresh(self, entry: Optional[dict], now: float) -> bool:
+        return entry is not None and now - entry['checked'] < self.ttl
+
+    def _request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """Send a request, backing off on 429 and server errors"""
+        for attempt in range(self.retries + 1):
+            self.requests += 1
+            instrument.count("mojang_requests")
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                print(f"Error requesting {url}: {e}")
+                response = None
+
+            if response is not None and response.status_code != 429 and response.status_code < 500:
+                return response
+
+            if attempt < self.retries:
+                time.sleep(retry_delay(response, self.backoff * 2 ** attempt))
+        return None
+
+    def _remember(self, uuid: str, name: str, now: float):
+        """Store a confirmed uuid/name pair and extend the name history"""
+        uuid = plain_uuid(uuid)
+        profile = self.profiles.setdefault(uuid, {"name": name, "checked": now, "history": []})
+        old_name = profile["name"]
+        if old_name and old_name != name and self.names.get(old_name.lower(), {}).get("uuid") == uuid:
+            # the old name is free again, it may belong to someone else by now
+            del self.names[old_name.lower()]
+        if not profile["history"] or profile["history"][-1]["name"] != name:
+            profile["history"].append({"name": name, "seen": now})
+        profile["name"] = name
+        profile["checked"] = now
+        self.names[name.lower()] = {"uuid": uuid, "checked": now}
+        self._dirty = True
+
+    def _fetch_name(self, uuid: str) -> Optional[dict]:
+        response = self._request('GET', self.profile_url.format(plain_uuid(uuid)))
+        if response is None:
+            return None
+        if response.status_code == 200:
+            return response.json()
+        return {}
+
+    def names_for(self, uuids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Current name of every UUID, None if it could not be resolved"""
+        now = time.time()
+        uuids = list(dict.fromkeys(uuids))
+        misses = [uuid for uuid in uuids if not self._fresh(self.profiles.get(plain_uuid(uuid)), now)]
+
+        if misses:
+            print(f"Resolving {len(misses)} of {len(uuids)} UUIDs ({len(uuids) - len(misses)} cached)")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                future_to_uuid = {executor.submit(self._fetch_name, uuid): uuid for uuid in misses}
+
+                for future in as_completed(future_to_uuid):
+                    uuid = future_to_uuid[future]
+                    profile = future.result()
+                    if profile:
+                        self._remember(profile['id'], profile['name'], now)
+                    elif profile is not None:
+                        # unknown UUID, keep the stale name (if any) but don't ask again before the ttl
+                        self.profiles.setdefault(plain_uuid(uuid), {"name": None, "history": []})["checked"] = now
+                        self._dirty = True
+
+        return {uuid: self.profiles.get(plain_uuid(uuid), {}).get("name") for uuid in uuids}
+
+    def uuids_for(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """UUID (without dashes) of every name, None for names Mojang doesn't know"""
+        now = time.time()
+        names = list(dict.fromkeys(names))
+        misses = [name for name in names if not self._fresh(self.names.get(name.lower()), now)]
+
+        if misses:
+            print(f"Resolving {len(misses)} of {len(names)} names ({len(names) - len(misses)} cached)")
+            for i in range(0, len(misses), bulk_size):
+                batch = misses[i:i + bulk_size]
+                response = self._request('POST', self.bulk_url, json=batch)
+                if response is None or response.status_code != 200:
+                    print(f"Failed to resolve {', '.join(batch)}")
+                    continue
+
+                found = set()
+                for profile in response.json():
+                    self._remember(profile['id'], profile['name'], now)
+                    found.add(profile['name'].lower())
+
+                for name in batch:
+                    if name.lower() not in found:
+                        self.names[name.lower()] = {"uuid": None, "checked": now}
+                        self._dirty = True
+
+        return {name: self.names.get(name.lower(), {}).get("uuid") for name in names}
+
+    def history(self, uuid: str) -> List[str]:
+        """Names a UUID has been seen with, oldest first"""
+        return [entry["name"] for entry in self.profiles.get(plain_uuid(uuid), {}).get("history", [])]
+
+    def save(self):
+        """Write the cache back to disk if anything changed"""
+        if not self._dirty:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': cache_version, 'profiles': self.profiles, 'names': self.names}, f, ensure_ascii=False)
+        self._dirty = False